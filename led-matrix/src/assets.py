@@ -0,0 +1,134 @@
+from PIL import Image
+import os
+import threading
+
+from config import Config
+
+class Assets:
+    """
+    Loads the icon PNGs once and caches every resized variant the views ask for.
+    """
+    GROUPS = {
+        "weather_icons": os.path.join("weather_view", "icons"),
+        "moon_icons": os.path.join("weather_view", "moon_icons"),
+        "network_icons": "network_view",
+    }
+
+    # Variants drawn by the views. Loaded ahead of time by warm().
+    PRELOAD = [
+        ("weather_icons", 7, "RGB"),
+        ("weather_icons", 4, "RGB"),
+        ("moon_icons", 22, "RGB"),
+        ("network_icons", 7, "RGB"),
+    ]
+
+    _variants = {}
+    _lock = threading.Lock()
+
+    _hits = 0
+    _misses = 0
+    _disk_reads = 0
+
+    def get(group, code, size, mode="RGB"):
+        """
+        Returns the icon resized to a square of the given size.
+        """
+        key = (group, code, size, mode)
+
+        with Assets._lock:
+            variant = Assets._variants.get(key)
+            if variant is not None:
+                Assets._hits += 1
+                return variant
+
+            Assets._misses += 1
+
+        # Decoded outside the lock so cache hits never wait on the disk.
+        # The full size source isn't kept, only the variants built from it.
+        source = Assets.load_source(group, code)
+        variant = source.resize((size, size), Image.BOX).convert(mode)
+
+        with Assets._lock:
+            return Assets._variants.setdefault(key, variant)
+
+    def load_source(group, code):
+        """
+        Reads the full size icon from disk.
+        """
+        path = os.path.join(Config.ASSETS_PATH, Assets.GROUPS[group], f"{code}.png")
+
+        with Image.open(path) as image:
+            image.load()
+            source = image.copy()
+
+        with Assets._lock:
+            Assets._disk_reads += 1
+
+        return source
+
+    def get_codes(group):
+        """
+        Returns the code of every icon in the group.
+        """
+        path = os.path.join(Config.ASSETS_PATH, Assets.GROUPS[group])
+
+        return [
+            os.path.splitext(file_name)[0]
+            for file_name in sorted(os.listdir(path))
+            if file_name.endswith(".png")
+        ]
+
+    def warm(groups=None):
+        """
+        Builds the preloaded variants of the given groups, or of every group.
+        Each icon is read once for all of its variants, then dropped.
+        """
+        for group in Assets.GROUPS:
+            if groups is not None and group not in groups:
+                continue
+
+            variants = [(size, mode) for preload_group, size, mode in Assets.PRELOAD if preload_group == group]
+            if not variants:
+                continue
+
+            for code in Assets.get_codes(group):
+                missing = [
+                    (size, mode) for size, mode in variants
+                    if (group, code, size, mode) not in Assets._variants
+                ]
+                if not missing:
+                    continue
+
+                source = Assets.load_source(group, code)
+
+                for size, mode in missing:
+                    variant = source.resize((size, size), Image.BOX).convert(mode)
+
+                    with Assets._lock:
+                        Assets._variants.setdefault((group, code, size, mode), variant)
+
+        Assets.log(f"Warmed {len(Assets._variants)} variants.")
+
+    def warm_async(groups=None):
+        """
+        Runs warm() in a background thread.
+        """
+        thread = threading.Thread(name="assets", target=Assets.warm, args=(groups,))
+        thread.daemon = True
+        thread.start()
+
+        return thread
+
+    def stats():
+        """
+        Returns the cache hit and miss counters and the number of files read from disk.
+        """
+        return {
+            "hits": Assets._hits,
+            "misses": Assets._misses,
+            "disk_reads": Assets._disk_reads,
+            "variants": len(Assets._variants),
+        }
+
+    def log(text):
+        print(f"Assets - {text}")
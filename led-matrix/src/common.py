@@ -1,3 +1,4 @@
+import os
 import time
 
 def msleep(ms):
@@ -5,3 +6,111 @@ def msleep(ms):
     Sleep in milliseconds.
     """
     time.sleep(ms / 1000)
+
+class FrameClock:
+    """
+    Paces a render loop against a monotonic clock.
+    Frame n is due at start + n * interval, so render time doesn't add up as drift.
+    An interval of 0 leaves the loop unpaced.
+    """
+    def __init__(self, interval_ms):
+        self.interval = interval_ms / 1000
+
+        self.frames = 0
+        self.late_frames = 0
+        self.dropped_frames = 0
+
+        self._start = time.monotonic()
+        self._deadline = self._start
+
+    def tick(self):
+        """
+        Sleeps until the next frame is due.
+        Returns the number of frames that should be skipped to catch up.
+        """
+        self.frames += 1
+
+        if self.interval <= 0:
+            return 0
+
+        self._deadline += self.interval
+
+        now = time.monotonic()
+        if now < self._deadline:
+            time.sleep(self._deadline - now)
+            return 0
+
+        self.late_frames += 1
+
+        # Skip every deadline that has already passed.
+        missed = int((now - self._deadline) // self.interval)
+        self._deadline += missed * self.interval
+        self.dropped_frames += missed
+
+        return missed
+
+    def get_fps(self):
+        """
+        Returns the achieved frame rate.
+        """
+        elapsed = time.monotonic() - self._start
+        if elapsed <= 0:
+            return 0
+
+        return round(self.frames / elapsed, 2)
+
+    def log_stats(self, name):
+        if self.interval <= 0:
+            print(f"Frame Clock - {name}: {self.get_fps()} fps (unpaced).")
+            return
+
+        print(
+            f"Frame Clock - {name}: {self.get_fps()} fps "
+            f"(target {round(1 / self.interval, 2)}), "
+            f"{self.late_frames} late, {self.dropped_frames} dropped."
+        )
+
+class BootTimer:
+    """
+    Records how long each stage of startup takes.
+    """
+    def __init__(self):
+        self._start = time.monotonic()
+        self._last = self._start
+        self._stages = []
+
+        # Time the interpreter took to start, where the OS can tell us.
+        process_start = get_process_start()
+        if process_start is not None:
+            self._stages.append(("interpreter", time.clock_gettime(time.CLOCK_BOOTTIME) - process_start))
+
+    def mark(self, stage):
+        """
+        Ends the current stage.
+        """
+        now = time.monotonic()
+        self._stages.append((stage, now - self._last))
+        self._last = now
+
+    def log_report(self):
+        for stage, elapsed in self._stages:
+            self.log(f"{stage}: {round(elapsed * 1000)} ms")
+
+        total = sum(elapsed for _, elapsed in self._stages)
+        self.log(f"total: {round(total * 1000)} ms")
+
+    def log(self, text):
+        print(f"Boot - {text}")
+
+def get_process_start():
+    """
+    Returns when this process started, in seconds since boot. Linux only.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name can contain spaces, so split after it.
+            fields = f.read().rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return None
+
+    return int(fields[19]) / os.sysconf("SC_CLK_TCK")
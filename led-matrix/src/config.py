@@ -9,6 +9,7 @@ class Config:
     FONTS = os.path.join(SRC_BASE, "assets", "fonts")
     STATE_PATH = os.path.join(SRC_BASE, "..", "state.json")
     ASSETS_PATH = os.path.join(SRC_BASE, "assets")
+    CACHE_PATH = os.path.join(SRC_BASE, "..", "cache")
 
     # Environment variables.
     ENV_VALUES = dotenv_values()
@@ -0,0 +1,223 @@
+from PIL import Image, ImageFont
+from functools import lru_cache
+import numpy as np
+import math
+import os
+import threading
+
+from config import Config
+
+class Fonts:
+    """
+    Loads the bundled pixel fonts once and shares them between all views.
+    """
+    FILES = {
+        "6px-Normal": "6px-Normal.ttf",
+        "cg-pixel-4x5": "cg-pixel-4x5.ttf",
+        "resolution-3x4": "resolution-3x4.ttf",
+    }
+
+    _fonts = {}
+    _lock = threading.Lock()
+
+    def get(name, size):
+        """
+        Returns the glyph atlas for the font at the given size.
+        The font file is only opened the first time it is requested.
+        """
+        key = (name, size)
+
+        with Fonts._lock:
+            if key not in Fonts._fonts:
+                Fonts._fonts[key] = GlyphAtlas(name, size)
+
+            return Fonts._fonts[key]
+
+    def cache_info():
+        """
+        Returns the hit and miss counts for the rendered text and width caches.
+        """
+        return {
+            "text": render_text.cache_info(),
+            "length": text_length.cache_info(),
+        }
+
+class GlyphAtlas:
+    """
+    Rasterizes the printable ASCII glyphs of a font into a single bitmap.
+    Strings are composed by blitting glyphs out of the atlas.
+    """
+    CHARACTERS = "".join(chr(c) for c in range(32, 127))
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+        path = os.path.join(Config.FONTS, Fonts.FILES[name])
+        self.font = ImageFont.truetype(path, size)
+
+        self._advances = {c: self.font.getlength(c) for c in self.CHARACTERS}
+
+        # Atlases are keyed by the sub-pixel start of the text.
+        self._atlases = {}
+
+        # Some sizes place glyphs differently in a string than one at a time.
+        # Those are always rendered by the font itself.
+        self.exact = self.check_atlas()
+
+    def length(self, text):
+        """
+        Returns the width of the text in pixels.
+        """
+        return text_length(self.name, self.size, text)
+
+    def draw(self, image, xy, text, fill):
+        """
+        Draws the text onto the image. Equivalent to ImageDraw.text.
+        """
+        x = int(xy[0])
+        y = int(xy[1])
+        start = (math.modf(xy[0])[0], math.modf(xy[1])[0])
+
+        rendered, offset = render_text(self.name, self.size, text, fill, start)
+        if rendered is None:
+            return
+
+        image.paste(rendered, (x + offset[0], y + offset[1]), rendered)
+
+    def get_atlas(self, start):
+        """
+        Returns the atlas for the sub-pixel start, building it if needed.
+        """
+        if start not in self._atlases:
+            self._atlases[start] = self.build_atlas(start)
+
+        return self._atlases[start]
+
+    def build_atlas(self, start):
+        """
+        Rasterizes every glyph side by side into one bitmap.
+        Returns the bitmap and the box and offset of each glyph.
+        """
+        masks = []
+        width = 0
+        height = 0
+
+        for c in self.CHARACTERS:
+            mask, offset = self.font.getmask2(c, "L", start=start)
+            masks.append((c, mask, offset))
+            width += mask.size[0]
+            height = max(height, mask.size[1])
+
+        bitmap = np.zeros((height, width), dtype=np.uint8)
+        glyphs = {}
+
+        x = 0
+        for c, mask, offset in masks:
+            w, h = mask.size
+            if w and h:
+                bitmap[:h, x:x + w] = np.asarray(mask).reshape(h, w)
+
+            glyphs[c] = (x, w, h, offset)
+            x += w
+
+        return bitmap, glyphs
+
+    def check_atlas(self):
+        """
+        Returns whether strings composed from the atlas match the font's own
+        rendering, compared on every printable character in both orders.
+        """
+        start = (0.0, 0.0)
+
+        for text in (self.CHARACTERS, self.CHARACTERS[::-1]):
+            composed = self.compose_atlas(text, start)
+            rendered = self.render(text, start)
+
+            if self.to_canvas(*composed, text) != self.to_canvas(*rendered, text):
+                return False
+
+        return True
+
+    def to_canvas(self, mask, offset, text):
+        """
+        Returns the bytes of the mask drawn at its offset on a blank canvas.
+        """
+        margin = self.size * 2
+        canvas = Image.new("L", (int(self.font.getlength(text)) + margin * 2, self.size + margin * 2))
+
+        if mask is not None:
+            canvas.paste(mask, (margin + offset[0], margin + offset[1]))
+
+        return canvas.tobytes()
+
+    def compose(self, text, start):
+        """
+        Builds the mask for a string out of the atlas glyphs.
+        Returns the mask and its offset from the text position.
+        """
+        if not self.exact or any(c not in self._advances for c in text):
+            return self.render(text, start)
+
+        return self.compose_atlas(text, start)
+
+    def render(self, text, start):
+        """
+        Renders the mask for a string with the font itself.
+        """
+        mask, offset = self.font.getmask2(text, "L", start=start)
+        if not (mask.size[0] and mask.size[1]):
+            return None, offset
+
+        return Image.frombytes("L", mask.size, bytes(mask)), offset
+
+    def compose_atlas(self, text, start):
+        bitmap, glyphs = self.get_atlas(start)
+
+        # Place each glyph at its advance.
+        placed = []
+        position = 0.0
+        for c in text:
+            x, w, h, offset = glyphs[c]
+            if w and h:
+                placed.append((x, w, h, int(position) + offset[0], offset[1]))
+
+            position += self._advances[c]
+
+        if not placed:
+            return None, (0, 0)
+
+        left = min(p[3] for p in placed)
+        top = min(p[4] for p in placed)
+        right = max(p[3] + p[1] for p in placed)
+        bottom = max(p[4] + p[2] for p in placed)
+
+        mask = np.zeros((bottom - top, right - left), dtype=np.uint8)
+
+        for x, w, h, dx, dy in placed:
+            region = mask[dy - top:dy - top + h, dx - left:dx - left + w]
+            np.maximum(region, bitmap[:h, x:x + w], out=region)
+
+        return Image.fromarray(mask, "L"), (left, top)
+
+@lru_cache(maxsize=1024)
+def render_text(name, size, text, fill, start=(0.0, 0.0)):
+    """
+    Renders the text in the given colour as an RGBA image.
+    Returns the image and its offset from the text position.
+    """
+    mask, offset = Fonts.get(name, size).compose(text, start)
+    if mask is None:
+        return None, offset
+
+    rendered = Image.new("RGBA", mask.size, fill)
+    rendered.putalpha(mask)
+
+    return rendered, offset
+
+@lru_cache(maxsize=1024)
+def text_length(name, size, text):
+    """
+    Returns the width of the text in pixels.
+    """
+    return Fonts.get(name, size).font.getlength(text)
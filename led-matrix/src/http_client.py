@@ -0,0 +1,180 @@
+from collections import OrderedDict
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+import threading
+import time
+
+class HttpClient:
+    """
+    Shared fetch layer for the views that call web APIs.
+    Keeps one pooled session per host, so connections are reused between
+    requests, and applies connect and read timeouts to every request.
+    """
+    CONNECT_TIMEOUT = 3.05  # s.
+    READ_TIMEOUT = 10  # s.
+    POOL_SIZE = 8  # Connections kept open per host.
+
+    CACHE_SIZE = 64  # Responses kept for revalidation.
+    STATS_INTERVAL = 600  # s between stats logs. 0 to never log.
+    MAX_ENDPOINTS = 32  # Endpoints with their own stats. The rest share "other".
+
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, pool_size=POOL_SIZE):
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+
+        self._sessions = {}
+        self._cache = OrderedDict()
+        self._stats = {}
+        self._lock = threading.Lock()
+
+        self._stats_time = time.monotonic()
+
+    def get(self, url, endpoint=None, revalidate=False, **kwargs):
+        return self.request("GET", url, endpoint, revalidate, **kwargs)
+
+    def post(self, url, endpoint=None, **kwargs):
+        return self.request("POST", url, endpoint, **kwargs)
+
+    def request(self, method, url, endpoint=None, revalidate=False, **kwargs):
+        """
+        Sends a request through the session for the URL's host.
+        With revalidate, the last response for the URL is sent back with its
+        ETag or Last-Modified, and is returned again if the server answers 304.
+        Raises requests exceptions like requests.request does.
+        """
+        endpoint = endpoint or self.get_endpoint(url)
+        kwargs.setdefault("timeout", self.timeout)
+
+        cached = None
+        if revalidate:
+            with self._lock:
+                cached = self._cache.get(url)
+
+            if cached is not None:
+                headers = dict(kwargs.get("headers") or {})
+                if "ETag" in cached.headers:
+                    headers["If-None-Match"] = cached.headers["ETag"]
+                if "Last-Modified" in cached.headers:
+                    headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+                kwargs["headers"] = headers
+
+        start_time = time.monotonic()
+        try:
+            response = self.get_session(url).request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            self.record(endpoint, time.monotonic() - start_time, 0, error=True)
+            raise
+
+        size = len(response.content)
+        self.record(endpoint, time.monotonic() - start_time, size, not_modified=response.status_code == 304)
+
+        if revalidate:
+            if response.status_code == 304 and cached is not None:
+                return cached
+
+            if response.ok and ("ETag" in response.headers or "Last-Modified" in response.headers):
+                self.store(url, response)
+
+        return response
+
+    def get_session(self, url):
+        """
+        Returns the session for the URL's host, creating it the first time.
+        """
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[host] = session
+
+        return session
+
+    def get_endpoint(self, url):
+        """
+        Names an endpoint by its host and path. The query is left out so
+        tokens aren't logged and every call to the endpoint shares its stats.
+        """
+        parts = urlsplit(url)
+        return f"{parts.netloc}{parts.path}"
+
+    def store(self, url, response):
+        with self._lock:
+            self._cache[url] = response
+            self._cache.move_to_end(url)
+
+            while len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def record(self, endpoint, elapsed, size, not_modified=False, error=False):
+        with self._lock:
+            if endpoint not in self._stats and len(self._stats) >= self.MAX_ENDPOINTS:
+                endpoint = "other"
+
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = {
+                    "requests": 0,
+                    "errors": 0,
+                    "not_modified": 0,
+                    "bytes": 0,
+                    "latency": 0,
+                    "latency_max": 0,
+                }
+
+            stats["requests"] += 1
+            stats["errors"] += error
+            stats["not_modified"] += not_modified
+            stats["bytes"] += size
+            stats["latency"] += elapsed
+            stats["latency_max"] = max(stats["latency_max"], elapsed)
+
+            log_due = self.STATS_INTERVAL and time.monotonic() - self._stats_time >= self.STATS_INTERVAL
+            if log_due:
+                self._stats_time = time.monotonic()
+
+        if log_due:
+            self.log_stats()
+
+    def get_stats(self):
+        """
+        Returns a copy of the stats of every endpoint, with latency in ms.
+        """
+        with self._lock:
+            stats = {endpoint: dict(values) for endpoint, values in self._stats.items()}
+
+        for values in stats.values():
+            values["latency"] = round(values["latency"] / max(1, values["requests"]) * 1000, 1)
+            values["latency_max"] = round(values["latency_max"] * 1000, 1)
+
+        return stats
+
+    def log_stats(self):
+        for endpoint, stats in self.get_stats().items():
+            self.log(
+                f"{endpoint}: {stats['requests']} requests, "
+                f"{stats['errors']} failed, {stats['not_modified']} not modified, "
+                f"{round(stats['bytes'] / 1024, 1)} KB, "
+                f"{stats['latency']} ms avg, {stats['latency_max']} ms max."
+            )
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            self._cache.clear()
+
+        for session in sessions:
+            session.close()
+
+    def log(self, text):
+        print(f"HTTP - {text}")
+
+# Client shared by all views, so each host has a single pool.
+shared_client = HttpClient()
@@ -0,0 +1,166 @@
+from collections import OrderedDict
+import os
+import threading
+import time
+
+class LazyView:
+    """
+    Builds a view the first time it is needed. The view can be released
+    again to free its resources, and is rebuilt when it is next shown.
+    """
+    def __init__(self, cache, factory, *args, **kwargs):
+        self._cache = cache
+        self._factory = factory
+        self._args = args
+        self._kwargs = kwargs
+
+        self._view = None
+        self._lock = threading.Lock()
+
+        # Held while a view is closed, since a release and a warm can both close it.
+        self._close_lock = threading.Lock()
+
+    def get(self):
+        """
+        Returns the view, building it if needed.
+        """
+        with self._lock:
+            if self._view is None:
+                start_time = time.monotonic()
+                self._view = self._factory(*self._args, **self._kwargs)
+
+                self.log(f"Built {self.get_name()} in {round((time.monotonic() - start_time) * 1000)} ms.")
+
+            view = self._view
+
+        self._cache.touch(self)
+
+        return view
+
+    def run(self):
+        return self.get().run()
+
+    def prefetch(self, executor, warm=False):
+        """
+        Builds the view on the executor so it is ready when it is shown.
+        With warm, the view also loads its data and first frame if it can.
+        """
+        if self.is_loaded() and not warm:
+            return
+
+        future = executor.submit(self.load, warm)
+        future.add_done_callback(self.check_prefetch)
+
+    def check_prefetch(self, future):
+        # The executor keeps exceptions in the future, so report them here.
+        error = future.exception()
+        if error is not None:
+            self.log(f"Prefetch of {self.get_name()} failed: {error}")
+
+    def load(self, warm):
+        view = self.get()
+
+        if not (warm and hasattr(view, "prefetch")):
+            return
+
+        start_time = time.monotonic()
+        view.prefetch()
+
+        # Released while it was warming. The release may have closed the view
+        # before the warm started anything, so close it again.
+        if self._view is not view:
+            self.close_view(view)
+            return
+
+        self.log(f"Warmed {self.get_name(view)} in {round((time.monotonic() - start_time) * 1000)} ms.")
+
+    def release(self):
+        """
+        Drops the view, calling its close() first if it has one.
+        """
+        with self._lock:
+            view = self._view
+            self._view = None
+
+        if view is None:
+            return
+
+        self.close_view(view)
+
+        self.log(f"Released {self.get_name(view)}.")
+
+    def close_view(self, view):
+        if hasattr(view, "close"):
+            with self._close_lock:
+                view.close()
+
+    def get_factory(self):
+        return self._factory
+
+    def is_loaded(self):
+        return self._view is not None
+
+    def get_name(self, view=None):
+        view = view or self._view
+        if view is not None and hasattr(view, "get_name"):
+            return view.get_name()
+
+        return self._factory.__name__
+
+    def log(self, text):
+        print(f"Lazy View - {text}")
+
+class ViewCache:
+    """
+    Tracks the built views in least recently used order and releases the
+    oldest ones when there are too many or the process uses too much memory.
+    """
+    def __init__(self, max_views, memory_budget):
+        self.max_views = max_views
+        self.memory_budget = memory_budget  # MB of resident memory. 0 for no limit.
+
+        self._views = OrderedDict()
+        self._lock = threading.Lock()
+
+    def touch(self, view):
+        with self._lock:
+            self._views[view] = True
+            self._views.move_to_end(view)
+
+    def trim(self, keep=()):
+        """
+        Releases the least recently used views, other than the ones to keep,
+        until the cache is within its limits.
+        """
+        while self.over_budget():
+            with self._lock:
+                candidates = [view for view in self._views if view not in keep]
+                if not candidates:
+                    return
+
+                view = candidates[0]
+                del self._views[view]
+
+            view.release()
+
+    def over_budget(self):
+        if len(self._views) > self.max_views:
+            return True
+
+        if self.memory_budget:
+            rss = get_rss()
+            return rss is not None and rss > self.memory_budget
+
+        return False
+
+def get_rss():
+    """
+    Returns the resident memory of the process in MB, or None if it can't be read.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
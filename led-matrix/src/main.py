@@ -1,50 +1,103 @@
-import urllib3
+from common import BootTimer
+
+# Started before the other imports so they are included in the boot report.
+boot_timer = BootTimer()
+
+import queue
 import signal
 import threading
 import sys
 
-from PIL import Image
-
 from config import Config
 
-from button_handler import ButtonHandler
-
 from matrix import Matrix
+from scheduler import CancelToken
 from view_handler import ViewHandler
 
-urllib3.disable_warnings()
+boot_timer.mark("imports")
 
 class Main:
     def __init__(self):
+        # Standby requests from pir-ctrl. Handled from the start so a signal
+        # during boot is queued instead of killing the process.
+        self._standby_requests = queue.SimpleQueue()
+        signal.signal(signal.SIGUSR1, self.signal_handler)
+        signal.signal(signal.SIGUSR2, self.signal_handler)
+
         self._matrix = Matrix()
+        boot_timer.mark("matrix init")
+
+        self._standby_thread = threading.Thread(name="standby", target=self.standby_thread)
+        self._standby_thread.daemon = True
+        self._standby_thread.start()
+
+        self._sigint_stop_event = threading.Event()
+        self._press_event = CancelToken()
+        self._long_press_event = threading.Event()
+
+        # Show the startup screen before any view or network work.
+        self._view_handler = ViewHandler(self._matrix, self._press_event, self._long_press_event)
+        self._view_handler.draw_startup()
+        self._matrix.wait_shown(1)
+        boot_timer.mark("first frame")
 
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
 
-        Config.initialize_state()
+        import urllib3
+        urllib3.disable_warnings()
 
-        self._sigint_stop_event = threading.Event()
-        self._press_event = threading.Event()
-        self._long_press_event = threading.Event()
+        from assets import Assets
+        from button_handler import ButtonHandler
+
+        Config.initialize_state()
 
         self._button_thread = ButtonHandler(self._press_event, self._long_press_event, self._sigint_stop_event)
 
         if Config.VIRTUAL_MODE:
             self._button_thread.daemon = True
         self._button_thread.start()
+        boot_timer.mark("services")
+
+        self._view_handler.init_views()
+        boot_timer.mark("view construction")
+
+        # Load the icons of the configured views in the background, so they
+        # never read them from disk.
+        Assets.warm_async(self._view_handler.get_asset_groups())
+
+        boot_timer.log_report()
 
-        self._view_handler = ViewHandler(self._matrix, self._press_event, self._long_press_event)
         self._view_handler.start()
 
+    def standby_thread(self):
+        """
+        Applies the standby requests. The panel is blanked and the views pause
+        at their next frame, so nothing is drawn or fetched.
+        """
+        while True:
+            standby = self._standby_requests.get()
+
+            print(f"Main - {'Entering' if standby else 'Resuming from'} standby.")
+            self._matrix.set_standby(standby)
+
     def signal_handler(self, sig, frame):
+        # The handler runs on the view thread, possibly in the middle of a
+        # frame, so standby is only queued here. SimpleQueue.put is reentrant.
+        if sig == signal.SIGUSR1:
+            self._standby_requests.put(True)
+            return
+
+        if sig == signal.SIGUSR2:
+            self._standby_requests.put(False)
+            return
+
         print("Main - Sending stop event...")
         self._sigint_stop_event.set()
 
         self._view_handler.save_view()
 
-        # Hack to clear screen on termination.
-        image = Image.new("RGB", self._matrix.dimensions, color="black")
-        self._matrix.set_image(image)
+        self._matrix.clear()
 
         print("Main - Stopped.")
         sys.exit(0)
@@ -3,10 +3,18 @@ try:
 except ModuleNotFoundError:
     from virtual_rgb_matrix import RGBMatrix, RGBMatrixOptions
 
-import argparse
+from PIL import Image
 
+import argparse
+import collections
+import threading
+import time
 
 class Matrix:
+    SUPPRESS_UNCHANGED = True  # Skip pushing frames identical to the one on the panel.
+    RENDER_QUEUE = 2  # Frames waiting for the render thread. Older frames are dropped.
+    CLEAR_TIMEOUT = 1  # Seconds to wait for the render thread to blank the panel.
+
     def __init__(self):
         self._parser = argparse.ArgumentParser()
 
@@ -165,10 +173,40 @@ class Matrix:
             type=str
         )
 
+        self._parser.add_argument(
+            "--no-double-buffer",
+            dest="double_buffer",
+            help="Draw straight into the live display instead of swapping an offscreen canvas on vsync.",
+            action="store_false",
+        )
+
+        self._parser.add_argument(
+            "--no-render-thread",
+            dest="render_thread",
+            help="Push frames to the panel on the calling thread instead of a dedicated render thread.",
+            action="store_false",
+        )
+
         self.process()
 
         self.current_image = None
 
+        self._last_frame = None
+        self._transition = None
+        self._view_name = None
+
+        self.first_frame_time = None
+
+        # Cleared while in standby. set_image waits on it, which pauses the views.
+        self._awake = threading.Event()
+        self._awake.set()
+
+        # Held while a frame is submitted or the standby state changes, so no
+        # frame reaches the panel after it is blanked.
+        self._standby_lock = threading.Lock()
+        self._last_entry = None
+        self._frame_stats = {}
+
     def process(self):
         """
         Parse any command line arguments and set the matrix options.
@@ -214,6 +252,282 @@ class Matrix:
         self.matrix = RGBMatrix(options=options)
         self.dimensions = (self.matrix.width, self.matrix.height)
 
+        # Back buffer for double buffering. Frames are drawn into it and swapped in on vsync.
+        self._canvas = None
+        if self.args.double_buffer:
+            self._canvas = self.matrix.CreateFrameCanvas()
+
+        self._presenter = None
+        if self.args.render_thread:
+            self._presenter = FramePresenter(self.present, self.RENDER_QUEUE)
+            self._presenter.start()
+
     def set_image(self, image, unsafe=True):
+        self._awake.wait()
+
+        if self.first_frame_time is None:
+            self.first_frame_time = time.monotonic()
+
+        if self._transition is not None:
+            name = self._transition
+            self._transition = None
+
+            if self.current_image is not None and self.current_image.size == image.size:
+                # Imported here to keep NumPy out of startup.
+                from transitions import Transitions
+
+                Transitions.run(self, name, self.current_image, image, unsafe)
+
         self.current_image = image
-        self.matrix.SetImage(image, unsafe=unsafe)
+
+        # Compare the raw bytes rather than the image, since callers
+        # sometimes draw into the same image and send it again.
+        frame = image.tobytes()
+        stats = self.get_frame_stats(self._view_name)
+
+        if self.SUPPRESS_UNCHANGED and frame == self._last_frame:
+            stats["suppressed"] += 1
+            return
+
+        self._last_frame = frame
+        stats["pushed"] += 1
+
+        # The bytes are a snapshot, so callers can keep drawing into the image.
+        entry = {
+            "data": frame,
+            "mode": image.mode,
+            "size": image.size,
+            "unsafe": unsafe,
+            "time": time.monotonic(),
+            "stats": stats,
+        }
+
+        with self._standby_lock:
+            self._last_entry = entry
+
+            # Standby started while this frame was drawn. It is shown on resume instead.
+            if not self._awake.is_set():
+                return
+
+            self.submit(entry)
+
+    def submit(self, entry):
+        """
+        Hands a frame to the render thread, or presents it straight away without one.
+        """
+        if self._presenter is None:
+            self.present(entry)
+            return
+
+        dropped = self._presenter.submit(entry)
+        if dropped is not None and dropped["stats"] is not None:
+            dropped["stats"]["dropped"] += 1
+
+        stats = entry["stats"]
+        if stats is not None:
+            stats["max_depth"] = max(stats["max_depth"], self._presenter.get_depth())
+
+    def present(self, entry):
+        """
+        Shows a frame on the panel. Runs on the render thread.
+        """
+        if entry["data"] is None:
+            self.matrix.Clear()
+            return
+
+        image = Image.frombuffer(entry["mode"], entry["size"], entry["data"], "raw", entry["mode"], 0, 1)
+        self.push(image, entry["unsafe"])
+
+        stats = entry["stats"]
+        if stats is None:
+            return
+
+        latency = time.monotonic() - entry["time"]
+
+        stats["displayed"] += 1
+        stats["latency"] += latency
+        stats["latency_max"] = max(stats["latency_max"], latency)
+
+    def push(self, image, unsafe=True):
+        """
+        Sends a frame to the panel, through the back buffer when double buffering.
+        """
+        if self._canvas is None:
+            self.matrix.SetImage(image, unsafe=unsafe)
+            return
+
+        self._canvas.SetImage(image, unsafe=unsafe)
+        self._canvas = self.matrix.SwapOnVSync(self._canvas)
+
+    def clear(self):
+        """
+        Blanks the panel and waits until it is shown.
+        """
+        if self._presenter is not None:
+            self._presenter.discard()
+
+        self.submit({"data": None, "stats": None})
+        self._last_frame = None
+
+        self.wait_shown(self.CLEAR_TIMEOUT)
+
+    def set_standby(self, standby):
+        """
+        Blanks the panel and holds every view at its next frame until resumed.
+        Resuming puts the last frame straight back.
+        Takes locks, so it must not be called from a signal handler.
+        """
+        with self._standby_lock:
+            if standby == self.is_standby():
+                return
+
+            if standby:
+                self._awake.clear()
+
+                if self._presenter is not None:
+                    self._presenter.discard()
+
+                self.submit({"data": None, "stats": None})
+
+            else:
+                self._awake.set()
+
+                if self._last_entry is not None:
+                    self.submit(dict(self._last_entry, time=time.monotonic(), stats=None))
+
+        self.wait_shown(self.CLEAR_TIMEOUT)
+
+    def is_standby(self):
+        return not self._awake.is_set()
+
+    def wait_shown(self, timeout):
+        """
+        Waits until every frame handed to the render thread is on the panel.
+        """
+        if self._presenter is not None:
+            self._presenter.wait_idle(timeout)
+
+    def set_transition(self, name):
+        """
+        Plays the named transition from the current image into the next frame.
+        """
+        self._transition = name
+
+    def set_view(self, name):
+        """
+        Counts the frames that follow towards the named view.
+        """
+        self._view_name = name
+        self.first_frame_time = None
+
+    def get_frame_stats(self, name):
+        """
+        Returns the frame counts and display latency of a view.
+        """
+        if name not in self._frame_stats:
+            self._frame_stats[name] = {
+                "pushed": 0,
+                "suppressed": 0,
+                "dropped": 0,
+                "displayed": 0,
+                "latency": 0,
+                "latency_max": 0,
+                "max_depth": 0,
+            }
+
+        return self._frame_stats[name]
+
+    def log_frame_stats(self, name):
+        stats = self.get_frame_stats(name)
+        total = stats["pushed"] + stats["suppressed"]
+        percent = round(100 * stats["suppressed"] / total, 1) if total else 0
+
+        self.log(f"{name}: {stats['pushed']} frames pushed, {stats['suppressed']} suppressed ({percent}%).")
+
+        if self._presenter is not None:
+            displayed = stats["displayed"]
+            latency = round(stats["latency"] * 1000 / displayed, 2) if displayed else 0
+
+            self.log(
+                f"{name}: {displayed} displayed, {stats['dropped']} dropped, "
+                f"latency {latency} ms avg, {round(stats['latency_max'] * 1000, 2)} ms max, "
+                f"queue depth {stats['max_depth']} max."
+            )
+
+        # Only the virtual matrix keeps swap statistics.
+        if self._canvas is not None and hasattr(self.matrix, "get_swap_stats"):
+            swap_stats = self.matrix.get_swap_stats()
+            self.log(
+                f"{swap_stats['swaps']} swaps, vsync wait {swap_stats['vsync_wait_avg_ms']} ms avg, "
+                f"{swap_stats['vsync_wait_max_ms']} ms max."
+            )
+
+    def log(self, text):
+        print(f"Matrix - {text}")
+
+
+class FramePresenter(threading.Thread):
+    """
+    Pushes frames to the panel on its own thread, so slow output never stalls the views.
+    Only the newest frames are kept. When the queue is full the oldest frame is dropped.
+    """
+    def __init__(self, output, max_frames):
+        threading.Thread.__init__(self, name="presenter")
+        self.daemon = True
+
+        self._output = output
+        self._max_frames = max_frames
+
+        self._frames = collections.deque()
+        self._condition = threading.Condition()
+        self._busy = False
+
+    def run(self):
+        while True:
+            with self._condition:
+                while not self._frames:
+                    self._condition.wait()
+
+                entry = self._frames.popleft()
+                self._busy = True
+
+            try:
+                self._output(entry)
+            except Exception as e:
+                print(f"Frame Presenter - Failed to show frame: {e}")
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def submit(self, entry):
+        """
+        Queues a frame. Returns the frame it pushed out, if the queue was full.
+        """
+        dropped = None
+
+        with self._condition:
+            if len(self._frames) >= self._max_frames:
+                dropped = self._frames.popleft()
+
+            self._frames.append(entry)
+            self._condition.notify_all()
+
+        return dropped
+
+    def discard(self):
+        """
+        Drops every frame waiting to be shown.
+        """
+        with self._condition:
+            self._frames.clear()
+
+    def wait_idle(self, timeout):
+        """
+        Waits until every queued frame has been shown.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._frames and not self._busy, timeout)
+
+    def get_depth(self):
+        return len(self._frames)
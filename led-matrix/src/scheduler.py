@@ -0,0 +1,98 @@
+import heapq
+import itertools
+import threading
+import time
+
+class CancelToken(threading.Event):
+    """
+    Event that stops the running view, with the reason it was stopped.
+    Views wait on it instead of sleeping, so they stop as soon as it is set.
+    """
+    PRESS = "press"
+    ADVANCE = "advance"
+
+    def __init__(self):
+        threading.Event.__init__(self)
+        self.reason = None
+        self.set_time = None
+
+    def set(self, reason=PRESS):
+        if not self.is_set():
+            self.reason = reason
+            self.set_time = time.monotonic()
+
+        threading.Event.set(self)
+
+    def clear(self):
+        self.reason = None
+        self.set_time = None
+        threading.Event.clear(self)
+
+class Scheduler(threading.Thread):
+    """
+    Runs callbacks at their deadlines from a single thread.
+    Deadlines are kept in a priority queue, so scheduling never starts a thread.
+    """
+    def __init__(self):
+        threading.Thread.__init__(self, name="scheduler")
+        self.daemon = True
+
+        self._queue = []
+        self._counter = itertools.count()
+        self._cancelled = set()
+        self._condition = threading.Condition()
+
+    def run(self):
+        while True:
+            with self._condition:
+                while True:
+                    self.drop_cancelled()
+
+                    if not self._queue:
+                        self._condition.wait()
+                        continue
+
+                    deadline, handle, callback = self._queue[0]
+                    remaining = deadline - time.monotonic()
+
+                    if remaining <= 0:
+                        heapq.heappop(self._queue)
+                        break
+
+                    self._condition.wait(remaining)
+
+            try:
+                callback()
+            except Exception as e:
+                self.log(f"Callback failed: {e}")
+
+    def schedule(self, delay, callback):
+        """
+        Runs the callback after the delay in seconds. Returns a handle to cancel it.
+        """
+        handle = next(self._counter)
+
+        with self._condition:
+            heapq.heappush(self._queue, (time.monotonic() + delay, handle, callback))
+            self._condition.notify()
+
+        return handle
+
+    def cancel(self, handle):
+        """
+        Stops a scheduled callback from running, if it hasn't run yet.
+        """
+        if handle is None:
+            return
+
+        with self._condition:
+            if any(entry[1] == handle for entry in self._queue):
+                self._cancelled.add(handle)
+                self._condition.notify()
+
+    def drop_cancelled(self):
+        while self._queue and self._queue[0][1] in self._cancelled:
+            self._cancelled.discard(heapq.heappop(self._queue)[1])
+
+    def log(self, text):
+        print(f"Scheduler - {text}")
@@ -0,0 +1,49 @@
+from collections import namedtuple
+from types import MappingProxyType
+import threading
+
+Snapshot = namedtuple("Snapshot", ["version", "data"])
+
+class SnapshotStore:
+    """
+    Holds the latest data published by a request thread.
+    Writers build new data and swap it in with a single assignment, so readers
+    never see it half updated and don't need a lock to read it. The version
+    goes up on every publish, so readers can tell when there is something new.
+    """
+    def __init__(self, data):
+        self._snapshot = Snapshot(0, MappingProxyType(dict(data)))
+        self._condition = threading.Condition()
+
+    def get(self):
+        """
+        Returns the latest snapshot.
+        """
+        return self._snapshot
+
+    def publish(self, data):
+        """
+        Replaces the data with a read-only copy of the given dict.
+        """
+        with self._condition:
+            self._snapshot = Snapshot(self._snapshot.version + 1, MappingProxyType(dict(data)))
+            self._condition.notify_all()
+
+    def update(self, **changes):
+        """
+        Publishes a copy of the latest data with some values changed.
+        """
+        with self._condition:
+            data = dict(self._snapshot.data, **changes)
+            self._snapshot = Snapshot(self._snapshot.version + 1, MappingProxyType(data))
+            self._condition.notify_all()
+
+    def wait(self, version=0, timeout=None):
+        """
+        Blocks until a snapshot newer than the version is published, or the
+        timeout in seconds passes. Returns the latest snapshot either way.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._snapshot.version > version, timeout)
+
+        return self._snapshot
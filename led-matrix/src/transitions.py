@@ -1,65 +1,223 @@
-from PIL import Image, ImageChops
-import time
+from PIL import Image
+from functools import lru_cache
+import numpy as np
 
-from common import msleep
+from common import FrameClock
+
+def linear(t):
+    return t
+
+def ease_in(t):
+    return t * t * t
+
+def ease_out(t):
+    return 1 - (1 - t) ** 3
+
+def ease_in_out(t):
+    if t < 0.5:
+        return 4 * t * t * t
+
+    return 1 - (-2 * t + 2) ** 3 / 2
+
+EASINGS = {
+    "linear": linear,
+    "ease-in": ease_in,
+    "ease-out": ease_out,
+    "ease-in-out": ease_in_out,
+}
+
+# Effects take the previous and new frames as (height, width, 3) arrays and
+# return a kernel that renders the transition at a progress from 0 to 1.
+
+def vertical(prev, new):
+    """
+    Scrolls the new frame down over the previous one.
+    """
+    height, width = prev.shape[:2]
+
+    # New frame on top of the previous one. The window starts on the
+    # previous frame and moves up to the new one.
+    strip = np.concatenate((new, prev))
+
+    def kernel(progress):
+        position = round(progress * height)
+        return Transitions.get_window(strip, 0, height - position, width, height)
+
+    return kernel
+
+def horizontal(prev, new):
+    """
+    Scrolls the new frame in from the right, pushing the previous one out.
+    """
+    height, width = prev.shape[:2]
+    strip = np.concatenate((prev, new), axis=1)
+
+    def kernel(progress):
+        position = round(progress * width)
+        return Transitions.get_window(strip, position, 0, width, height)
+
+    return kernel
+
+def crossfade(prev, new):
+    """
+    Blends the frames with an integer alpha out of 256.
+    """
+    start = prev.astype(np.int32)
+    delta = new.astype(np.int32) - start
+
+    def kernel(progress):
+        alpha = round(progress * 256)
+        return (start + ((delta * alpha) >> 8)).astype(np.uint8)
+
+    return kernel
+
+def reveal(order):
+    """
+    Returns an effect that switches pixels to the new frame in the given order.
+    """
+    def effect(prev, new):
+        height, width = prev.shape[:2]
+        pixels = order(width, height)
+
+        prev = prev.reshape(-1, 3)
+        new = new.reshape(-1, 3)
+
+        def kernel(progress):
+            shown = pixels[:round(progress * len(pixels))]
+
+            frame = prev.copy()
+            frame[shown] = new[shown]
+
+            return frame.reshape(height, width, 3)
+
+        return kernel
+
+    return effect
+
+@lru_cache(maxsize=None)
+def radial_order(width, height):
+    """
+    Pixels from the center outwards.
+    """
+    y, x = np.mgrid[:height, :width]
+    distance = np.hypot(x - (width - 1) / 2, y - (height - 1) / 2)
+
+    return np.argsort(distance, axis=None, kind="stable")
+
+@lru_cache(maxsize=None)
+def diagonal_order(width, height):
+    """
+    Pixels from the top left corner to the bottom right.
+    """
+    y, x = np.mgrid[:height, :width]
+
+    return np.argsort(x / width + y / height, axis=None, kind="stable")
+
+@lru_cache(maxsize=None)
+def dissolve_order(width, height):
+    """
+    Pixels in a fixed random permutation.
+    """
+    return np.random.default_rng(0).permutation(width * height)
+
+@lru_cache(maxsize=None)
+def scanline_order(width, height):
+    """
+    Pixels row by row, left to right.
+    """
+    return np.arange(width * height)
 
 class Transitions:
-    def vertical_transition(matrix, prev_image, new_image, unsafe=True, speed_mult=1):
-        TRANSITION_INTERVAL = 40 * speed_mult
-        SHIFT_AMOUNT = 1
-
-        image = Image.new("RGB", (matrix.dimensions[0], matrix.dimensions[1] * 2), color="black")
-        image.paste(new_image, (0,0))
-        image.paste(prev_image, (0, matrix.dimensions[1]))
-
-        current_offset = 0
-
-        # Handle the transition
-        while True:
-            image = ImageChops.offset(image, 0, SHIFT_AMOUNT)
-            cropped = image.crop(
-                (
-                    0,
-                    matrix.dimensions[1],
-                    matrix.dimensions[0],
-                    matrix.dimensions[1] * 2
-                )
-            )
-
-            current_offset += SHIFT_AMOUNT
-
-            if current_offset > matrix.dimensions[1]:
-                break
-
-            matrix.set_image(cropped, unsafe=unsafe)
-            msleep(TRANSITION_INTERVAL)
-
-    def horizontal_transition(matrix, prev_image, new_image, unsafe=True, speed_mult=1):
-        TRANSITION_INTERVAL = 40 * speed_mult
-        SHIFT_AMOUNT = -1
-
-        image = Image.new("RGB", (matrix.dimensions[0] * 2, matrix.dimensions[1]), color="black")
-        image.paste(prev_image, (0,0))
-        image.paste(new_image, (matrix.dimensions[0], 0))
-
-        current_offset = 0
-
-        # Handle the transition
-        while True:
-            image = ImageChops.offset(image, SHIFT_AMOUNT, 0)
-            cropped = image.crop(
-                (
-                    0,
-                    0,
-                    matrix.dimensions[0],
-                    matrix.dimensions[1]
-                )
-            )
-
-            current_offset += SHIFT_AMOUNT
-
-            if abs(current_offset) > matrix.dimensions[0]:
-                break
-
-            matrix.set_image(cropped, unsafe=unsafe)
-            msleep(TRANSITION_INTERVAL)
+    FPS = 25  # Default frame rate of a transition.
+    STEP_TIME = 40  # Default time in ms to scroll by one pixel, scaled by speed_mult.
+    DURATION = 1000  # Default time in ms of the other effects, scaled by speed_mult.
+
+    EFFECTS = {}
+
+    def register(name, effect, duration=DURATION):
+        """
+        Adds an effect to the registry. The default duration is in ms, or a
+        function of the panel's width and height.
+        """
+        Transitions.EFFECTS[name] = {
+            "effect": effect,
+            "duration": duration,
+        }
+
+    def run(matrix, name, prev_image, new_image, unsafe=True, speed_mult=1, duration=None, easing="linear", fps=FPS):
+        """
+        Plays the named transition from the previous image to the new one.
+        """
+        entry = Transitions.EFFECTS[name]
+
+        if duration is None:
+            duration = entry["duration"]
+            if callable(duration):
+                duration = duration(*matrix.dimensions)
+
+            duration *= speed_mult
+
+        kernel = entry["effect"](np.asarray(prev_image), np.asarray(new_image))
+
+        frames = (
+            Transitions.to_image(kernel(progress))
+            for progress in Transitions.get_progress(duration, easing, fps)
+        )
+
+        Transitions.play(matrix, frames, fps, unsafe)
+
+    def vertical_transition(matrix, prev_image, new_image, unsafe=True, speed_mult=1, duration=None, easing="linear", fps=FPS):
+        Transitions.run(matrix, "vertical", prev_image, new_image, unsafe, speed_mult, duration, easing, fps)
+
+    def horizontal_transition(matrix, prev_image, new_image, unsafe=True, speed_mult=1, duration=None, easing="linear", fps=FPS):
+        Transitions.run(matrix, "horizontal", prev_image, new_image, unsafe, speed_mult, duration, easing, fps)
+
+    def get_progress(duration, easing="linear", fps=FPS):
+        """
+        Returns the eased progress of every step of a transition, ending on 1.
+        """
+        ease = EASINGS[easing] if isinstance(easing, str) else easing
+        steps = max(1, round(duration / 1000 * fps))
+
+        return [ease(i / steps) for i in range(1, steps + 1)]
+
+    def get_window(strip, x, y, width, height):
+        """
+        Returns part of a strip as an image, read straight out of the strip's
+        buffer without cropping or copying the strip.
+        """
+        stride = strip.shape[1] * 3
+        offset = y * stride + x * 3
+
+        buffer = memoryview(strip).cast("B")[offset:]
+
+        return Image.frombuffer("RGB", (width, height), buffer, "raw", "RGB", stride, 1)
+
+    def to_image(frame):
+        if isinstance(frame, Image.Image):
+            return frame
+
+        return Image.fromarray(frame, "RGB")
+
+    def play(matrix, frames, fps, unsafe=True):
+        """
+        Shows the frames at the given rate, skipping any the clock falls behind on.
+        """
+        clock = FrameClock(1000 / fps)
+        skip = 0
+
+        for frame in frames:
+            if skip > 0:
+                skip -= 1
+                continue
+
+            matrix.set_image(frame, unsafe=unsafe)
+            skip = clock.tick()
+
+Transitions.register("vertical", vertical, lambda width, height: height * Transitions.STEP_TIME)
+Transitions.register("horizontal", horizontal, lambda width, height: width * Transitions.STEP_TIME)
+Transitions.register("crossfade", crossfade)
+Transitions.register("wipe-radial", reveal(radial_order))
+Transitions.register("wipe-diagonal", reveal(diagonal_order))
+Transitions.register("dissolve", reveal(dissolve_order), 1500)
+Transitions.register("scanline", reveal(scanline_order))
@@ -1,16 +1,11 @@
-import os
-import threading
-from random import choice, randint
+from concurrent.futures import ThreadPoolExecutor
+import time
+from random import choices, randint
 
 from config import Config
-from PIL import Image, ImageDraw, ImageFont
-from views.iss_view.iss_view import ISSView
-from views.network_view.network_view import NetworkMonitor
-from views.poweroff_view import PoweroffView
-from views.switch_view import SwitchView
-from views.test_view.test_view import TestView
-from views.video_view.video_view import VideoView
-from views.weather_view.weather_view import WeatherView
+from lazy_view import LazyView, ViewCache
+from scheduler import CancelToken, Scheduler
+from PIL import Image, ImageDraw
 
 
 class ViewHandler:
@@ -21,6 +16,12 @@ class ViewHandler:
 
     START_VIEW = 0  # Index of view to start with.
     MANUAL_TIME = 300  # How long to hold view after manual press.
+    TRANSITION = None  # Transition into a view, unless the view sets its own. None cuts straight to it.
+
+    PREFETCH = True  # Build the next view while the current one runs.
+    PREFETCH_LEAD = 10  # Seconds before a switch to warm the next view's data and first frame.
+    MAX_LOADED_VIEWS = 4  # Views kept built before the least recently used is released.
+    MEMORY_BUDGET = 200  # MB of resident memory before views are released. 0 for no limit.
 
     def __init__(self, matrix, press_event, long_press_event):
         self._matrix = matrix
@@ -29,10 +30,27 @@ class ViewHandler:
 
         self._auto_switch = True
 
-        self.init_views()
-        self.init_mode()
+        self._scheduler = Scheduler()
+        self._scheduler.start()
+
+        self._view_cache = ViewCache(self.MAX_LOADED_VIEWS, self.MEMORY_BUDGET)
+
+        # One long-lived worker builds and warms views in the background.
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+
+        self._mode = None
+        self._views = None
 
     def init_views(self):
+        # The view modules pull in NumPy and requests, so they are imported
+        # here rather than at startup, after the startup screen is shown.
+        from views.iss_view.iss_view import ISSView
+        from views.poweroff_view import PoweroffView
+        from views.switch_view import SwitchView
+        from views.test_view.test_view import TestView
+        from views.video_view.video_view import VideoView
+        from views.weather_view.weather_view import WeatherView
+
         self._poweroff_view = PoweroffView(
             self._matrix, self._press_event, self._long_press_event
         )
@@ -42,49 +60,50 @@ class ViewHandler:
 
         self._views = [
             {
-                "view": ISSView(self._matrix, self._press_event),
+                "view": LazyView(self._view_cache, ISSView, self._matrix, self._press_event),
                 "time": 700,
                 "auto": True,
             },
             # {
-            #     "view": NetworkMonitor(self._matrix, self._press_event),
+            #     "view": LazyView(self._view_cache, NetworkMonitor, self._matrix, self._press_event),
             #     "time": 700,
             #     "auto": True
             # },
             {
-                "view": WeatherView(self._matrix, self._press_event),
+                "view": LazyView(self._view_cache, WeatherView, self._matrix, self._press_event),
                 "time": 410,
                 "auto": True,
             },
             {
-                "view": TestView(self._matrix, self._press_event),
+                "view": LazyView(self._view_cache, TestView, self._matrix, self._press_event),
                 "time": 120,
                 "auto": True,
             },
             {
-                "view": VideoView(self._matrix, self._press_event, "fireplace"),
+                "view": LazyView(self._view_cache, VideoView, self._matrix, self._press_event, "fireplace"),
                 "time": 300,
                 "auto": True,
+                "transition": "dissolve",
             },
             {
                 "random": [
                     {
-                        "view": VideoView(
-                            self._matrix, self._press_event, "balls", loop=False
+                        "view": LazyView(
+                            self._view_cache, VideoView, self._matrix, self._press_event, "balls", loop=False
                         ),
                         "time": 120,
                         "auto": True,
                     },
                     {
-                        "view": VideoView(
-                            self._matrix, self._press_event, "pillows", loop=False
+                        "view": LazyView(
+                            self._view_cache, VideoView, self._matrix, self._press_event, "pillows", loop=False
                         ),
                         "time": 120,
                         "auto": True,
                     },
                     {
-                        "view": VideoView(
-                            self._matrix, self._press_event, "obi", loop=False
+                        "view": LazyView(
+                            self._view_cache, VideoView, self._matrix, self._press_event, "obi", loop=False
                         ),
                         "time": 120,
                         "auto": True,
@@ -93,7 +112,7 @@ class ViewHandler:
                 "probability": 0.01,
             },
             {
-                "view": VideoView(self._matrix, self._press_event, "jeremy"),
+                "view": LazyView(self._view_cache, VideoView, self._matrix, self._press_event, "jeremy"),
                 "time": 120,
                 "auto": False,
             },
@@ -118,10 +137,16 @@ class ViewHandler:
             Config.update_key("view", self._current_view)
 
     def start(self):
-        self.draw_startup()
+        if self._views is None:
+            self.init_views()
+
+        self.init_mode()
 
         self._auto_timer = None
         self._manual_timer = None
+        self._prefetch_timer = None
+
+        self._switch_time = time.monotonic()
 
         skip = False
 
@@ -146,12 +171,32 @@ class ViewHandler:
             if not skip:
                 self.save_view()
                 self.draw_loading()
-                result = self._view["view"].run()
+
+                view = self._view["view"].get()
+                self.prefetch_next_view()
+
+                name = self.get_view_name(view)
+                self._matrix.set_view(name)
+                self._matrix.set_transition(self._view.get("transition", self.TRANSITION))
+
+                result = view.run()
+
+                self._matrix.set_transition(None)
+                self._matrix.log_frame_stats(name)
+                self.log_switch_latency(name)
+                self._matrix.set_view(None)
+
+                # The next switch starts when this view was told to stop.
+                self._switch_time = self._press_event.set_time or time.monotonic()
 
                 # View quit on its own. Considered an auto switch.
                 if result:
                     self._auto_switch = True
 
+            else:
+                # The skipped view may have been warmed. Stop anything it started.
+                self._view["view"].release()
+
             skip = False
 
             # Start shutdown view if long press detected.
@@ -192,38 +237,118 @@ class ViewHandler:
 
         self._matrix.set_image(image)
 
+    def get_asset_groups(self):
+        """
+        Returns the asset groups used by the configured views.
+        """
+        groups = set()
+
+        for view in self._views:
+            for entry in view.get("random", [view]):
+                groups.update(getattr(entry["view"].get_factory(), "ASSET_GROUPS", []))
+
+        return groups
+
     def get_next_view(self):
         view = self._views[self._current_view]
 
         while "random" in view.keys():
             r = randint(1, 100)
             if not self._auto_switch or r <= view["probability"] * 100:
-                return choice(view["random"])
+                return choices(view["random"], weights=[v.get("weight", 1) for v in view["random"]])[0]
 
             self.increment_view()
             view = self._views[self._current_view]
 
         return view
 
+    def prefetch_next_view(self):
+        """
+        Builds the view that comes next, unless it is picked at random,
+        and releases old views if there are too many.
+        """
+        keep = [self._view["view"]]
+
+        next_view = self._views[(self._current_view + 1) % len(self._views)]
+        if "view" in next_view:
+            keep.append(next_view["view"])
+
+            if self.PREFETCH:
+                next_view["view"].prefetch(self._prefetch_executor)
+
+        self._view_cache.trim(keep)
+
+    def warm_next_view(self):
+        """
+        Asks the view the timer will switch to to load its data and render
+        its first frame.
+        """
+        next_view = self.get_timer_view()
+
+        if next_view is None or next_view["view"] is self._view["view"]:
+            return
+
+        # Nothing is fetched while the panel is in standby.
+        if self._matrix.is_standby():
+            return
+
+        next_view["view"].prefetch(self._prefetch_executor, warm=True)
+
+    def get_timer_view(self):
+        """
+        Returns the view the timer will switch to, passing over the views
+        start() skips on an auto switch. None if it is picked at random.
+        """
+        for i in range(1, len(self._views) + 1):
+            view = self._views[(self._current_view + i) % len(self._views)]
+
+            # The probability gate may pass or not, so neither the random
+            # pick nor the view after it is known yet.
+            if "random" in view:
+                return None
+
+            # Timers only run in timed mode, where they make an auto switch.
+            if view["auto"]:
+                return view
+
+        return None
+
+    def log_switch_latency(self, name):
+        first_frame_time = self._matrix.first_frame_time
+        if first_frame_time is None:
+            return
+
+        self.log(f"Switched to {name} in {round((first_frame_time - self._switch_time) * 1000)} ms.")
+
+    def get_view_name(self, view):
+        if hasattr(view, "get_name"):
+            return view.get_name()
+
+        return type(view).__name__
+
     def increment_view(self):
         self._current_view = (self._current_view + 1) % len(self._views)
 
     def start_auto_timer(self):
-        self._auto_timer = threading.Timer(self._view["time"], self.handle_timer)
-        self._auto_timer.daemon = True
-        self._auto_timer.start()
+        self._auto_timer = self._scheduler.schedule(self._view["time"], self.handle_timer)
+        self.start_prefetch_timer(self._view["time"])
 
     def start_manual_timer(self):
-        self._manual_timer = threading.Timer(self.MANUAL_TIME, self.handle_timer)
-        self._manual_timer.daemon = True
-        self._manual_timer.start()
+        self._manual_timer = self._scheduler.schedule(self.MANUAL_TIME, self.handle_timer)
+        self.start_prefetch_timer(self.MANUAL_TIME)
+
+    def start_prefetch_timer(self, delay):
+        if self.PREFETCH:
+            self._prefetch_timer = self._scheduler.schedule(max(0, delay - self.PREFETCH_LEAD), self.warm_next_view)
 
     def cancel_timers(self):
-        try:
-            self._auto_timer.cancel()
-            self._manual_timer.cancel()
-        except AttributeError:
-            pass
+        self._scheduler.cancel(self._auto_timer)
+        self._scheduler.cancel(self._manual_timer)
+        self._scheduler.cancel(self._prefetch_timer)
+
+        self._auto_timer = None
+        self._manual_timer = None
+        self._prefetch_timer = None
 
     def clear_events(self):
         self._long_press_event.clear()
@@ -231,7 +356,7 @@ class ViewHandler:
 
     def handle_timer(self):
         self._auto_switch = True
-        self._press_event.set()
+        self._press_event.set(CancelToken.ADVANCE)
 
     def save_view(self):
         if self._mode == "manual":
@@ -1,59 +1,78 @@
-from PIL import Image, ImageChops, ImageOps, ImageFont, ImageDraw
+from PIL import Image, ImageChops, ImageColor, ImageOps, ImageDraw
 import time
 import numpy as np
 from math import pi, sin, cos, radians
 import json
 
 from config import Config
-from common import msleep
+from fonts import Fonts
+from common import FrameClock
+from http_client import shared_client
+from snapshot import SnapshotStore
 import os
 import requests
 import threading
 
 request_e = threading.Event()
-iss_coords = (0, 0)
-number_ast = None
-api_error = False
+request_t = None
+
+# Published by the request thread. The initial values are shown if the
+# first API call fails.
+iss_store = SnapshotStore(
+    {
+        "coords": (14.882, -51.77),
+        "astronauts": 7,
+        "error": False
+    }
+)
 
 
 class ISSView:
     REFRESH_INTERVAL = 150  # ms.
     API_INTERVAL = 5  # s.
+    DATA_TIMEOUT = 2  # s to wait for the first API call.
     BG_COLOUR = "black"
 
+    # Draw the spinning Earth from a precomputed table of pixels.
+    PRECOMPUTE_SPIN = True
+    SPIN_TABLE_BUDGET = 256 * 1024  # bytes.
+
     def __init__(self, matrix, press_event):
         self._matrix = matrix
         self._press_event = press_event
 
-        # Start the request thread.
-        self._request_t = threading.Thread(name="requests", target=request_thread)
-        self._request_t.daemon = True
-        self._request_t.start()
+        # Start the request thread once, even if the view is built again.
+        global request_t
+        if request_t is None:
+            request_t = threading.Thread(name="requests", target=request_thread)
+            request_t.daemon = True
+            request_t.start()
 
         request_e.set()
 
-        self._earth = Earth()
+        self._earth = Earth(
+            precompute=self.PRECOMPUTE_SPIN, table_budget=self.SPIN_TABLE_BUDGET
+        )
         self._earth.update_iss()
 
+        # Blank frame buffer copied at the start of every frame.
+        self._background = np.full(
+            (self._matrix.dimensions[1], self._matrix.dimensions[0], 3),
+            ImageColor.getrgb(self.BG_COLOUR),
+            dtype=np.uint8,
+        )
+
+        self._first_frame = None
+
     def run(self):
         """
         Starts the ISSView.
         """
-        global iss_coords, number_ast
-
         start_time = time.time()
 
-        counter = 0
-
-        # Wait for initial API call.
-        while (iss_coords == (0, 0) or number_ast is None) and counter < 10:
-            msleep(200)
-            counter += 1
+        self.wait_for_data()
 
-        # The initial call failed. We'll add some fake values.
-        if counter >= 10:
-            iss_coords = (14.882, -51.77)
-            number_ast = 7
+        clock = FrameClock(self.REFRESH_INTERVAL)
 
         while not self._press_event.is_set():
             current_time = time.time()
@@ -61,21 +80,56 @@ class ISSView:
                 start_time = current_time
                 request_e.set()
 
-            image = Image.new("RGB", self._matrix.dimensions, color=self.BG_COLOUR)
+            # Show the frame rendered by prefetch() first.
+            image = self._first_frame
+            if image is None:
+                image = self.render_frame()
 
-            self.draw_time(image)
-            self.draw_coords(image)
-            self.draw_ast(image)
+            self._first_frame = None
 
-            if api_error:
-                self.draw_error(image)
+            self._matrix.set_image(image)
 
-            self._earth.draw(image)
-            self._earth.update_spin()
+            clock.tick()
 
-            self._matrix.set_image(image)
+        clock.log_stats("ISSView")
+
+    def prefetch(self):
+        """
+        Fetches the ISS position and renders the first frame before the view is shown.
+        """
+        request_e.set()
+
+        self.wait_for_data()
+        self._first_frame = self.render_frame()
+
+    def wait_for_data(self):
+        """
+        Waits for the initial API call. The store's fake values are used if
+        it doesn't answer in time.
+        """
+        iss_store.wait(0, self.DATA_TIMEOUT)
+
+    def render_frame(self):
+        """
+        Draws the Earth and text and advances the spin.
+        """
+        data = iss_store.get().data
+
+        frame = self._background.copy()
+
+        self._earth.draw(frame)
+        self._earth.update_spin()
+
+        image = Image.fromarray(frame, "RGB")
+
+        self.draw_time(image)
+        self.draw_coords(image, data["coords"])
+        self.draw_ast(image, data["astronauts"])
 
-            msleep(self.REFRESH_INTERVAL)
+        if data["error"]:
+            self.draw_error(image)
+
+        return image
 
     def draw_time(self, image):
         """
@@ -87,25 +141,21 @@ class ISSView:
 
         color = (170, 170, 170)
 
-        font_path = os.path.join(Config.FONTS, "resolution-3x4.ttf")
         font_size = 4
 
-        f = ImageFont.truetype(font_path, font_size)
-        d = ImageDraw.Draw(image)
+        f = Fonts.get("resolution-3x4", font_size)
 
         time_str = time.strftime("%I:%M %p")
 
-        d.text((x_offset, y_offset), time_str, font=f, fill=color)
+        f.draw(image, (x_offset, y_offset), time_str, color)
 
-    def draw_coords(self, image):
+    def draw_coords(self, image, iss_coords):
         """
         Draws the latitude and longitude on the the screen.
         """
-        font_path = os.path.join(Config.FONTS, "cg-pixel-4x5.ttf")
         font_size = 5
 
-        f = ImageFont.truetype(font_path, font_size)
-        d = ImageDraw.Draw(image)
+        f = Fonts.get("cg-pixel-4x5", font_size)
 
         color = (170, 170, 170)
 
@@ -121,16 +171,16 @@ class ISSView:
         if len(lat) > truncate_len:
             lat = lat[:truncate_len]
 
-        d.text((x_offset, y_offset), lat, font=f, fill=color)
+        f.draw(image, (x_offset, y_offset), lat, color)
 
         # Draw longitude.
         lon = str(round(iss_coords[1], 3))
         if len(lon) > truncate_len:
             lon = lon[:truncate_len]
 
-        d.text((x_offset, y_offset + spacing), lon, font=f, fill=color)
+        f.draw(image, (x_offset, y_offset + spacing), lon, color)
 
-    def draw_ast(self, image):
+    def draw_ast(self, image, number_ast):
         """
         Draw icons for each astronaut on the ISS.
         """
@@ -232,11 +282,13 @@ class Earth:
 
     SPIN_THETA = 0.05
 
-    def __init__(self):
+    TABLE_BUDGET = 256 * 1024  # bytes.
+
+    def __init__(self, precompute=False, table_budget=TABLE_BUDGET):
         # Used for drawing the Earth.
         self._earth_nodes = np.zeros((0, 4))
         self._earth_nodes_backup = None
-        self._map = []
+        self._draw_mask = None
 
         # Used for drawing the ISS.
         self._iss_coords = None
@@ -248,9 +300,18 @@ class Earth:
 
         self._current_spin = 0
 
+        # Used for drawing from the precomputed spin table.
+        self._spin_coords = None
+        self._spin_offsets = None
+        self._spin_transforms = None
+        self._current_step = 0
+
         self.add_nodes()
         self.convert_map()
 
+        if precompute:
+            self.build_spin_table(table_budget)
+
     def convert_coords(self, lat, lon):
         """
         Converts latitude and longitude to Cartesian coordinates.
@@ -316,6 +377,16 @@ class Earth:
         Handles the logic to control the Earth rotation.
         Resets the nodes to the backed-up version after every full rotation.
         """
+        if self._spin_coords is not None:
+            self._current_step += 1
+
+            # Earth has done a full rotation. Start the table over.
+            if self._current_step >= len(self._spin_transforms):
+                self._current_step = 0
+                self.update_iss()
+
+            return
+
         self._current_spin += self.SPIN_THETA
 
         # Earth has done a full rotation. Reset the nodes for alignment.
@@ -327,58 +398,140 @@ class Earth:
 
         # Rotate counter-clockwise as normal.
         else:
-            c = np.cos(self.SPIN_THETA)
-            s = np.sin(self.SPIN_THETA)
+            self.rotate(self.get_spin_matrix())
 
-            matrix_y = np.array(
-                [[c, 0, s, 0], [0, 1, 0, 0], [-s, 0, c, 0], [0, 0, 0, 1]]
-            )
+    def get_spin_matrix(self):
+        """
+        Returns the rotation matrix for a single spin step.
+        """
+        c = np.cos(self.SPIN_THETA)
+        s = np.sin(self.SPIN_THETA)
 
-            self.rotate(matrix_y)
+        return np.array([[c, 0, s, 0], [0, 1, 0, 0], [-s, 0, c, 0], [0, 0, 0, 1]])
 
-    def rotate(self, matrix):
+    def get_transform(self, matrix):
         """
-        Applies the rotation matrix to the Earth array, ISS array, and home array.
+        Folds a rotation about the center of the Earth into a single 4x4 transform.
+        The transform is transposed so it can be applied to rows of nodes.
         """
         center = self.find_center()
 
-        for i, node in enumerate(self._earth_nodes):
-            self._earth_nodes[i] = center + np.matmul(matrix, node - center)
+        to_center = np.identity(4)
+        to_center[:3, 3] = -center[:3]
+
+        from_center = np.identity(4)
+        from_center[:3, 3] = center[:3]
 
-        self._iss_nodes[0] = center + np.matmul(matrix, self._iss_nodes[0] - center)
-        self._home_nodes[0] = center + np.matmul(matrix, self._home_nodes[0] - center)
+        return (from_center @ matrix @ to_center).T
 
-    def draw(self, image):
+    def rotate(self, matrix):
+        """
+        Applies the rotation matrix to the Earth array, ISS array, and home array.
+        Every node is transformed at once.
+        """
+        transform = self.get_transform(matrix)
+
+        self._earth_nodes = self._earth_nodes @ transform
+        self._iss_nodes = self._iss_nodes @ transform
+        self._home_nodes = self._home_nodes @ transform
+
+    def draw(self, frame):
         """
-        Draws the Earth, ISS, and home node arrays to the display.
+        Draws the Earth, ISS, and home node arrays into the frame buffer.
+        The frame buffer is a (height, width, 3) uint8 array.
         """
+        if self._spin_coords is not None:
+            self.draw_from_table(frame)
+            return
+
         # Draw the Earth.
-        for i, node in enumerate(self._earth_nodes):
-            if (
-                i > self.MAP_WIDTH - 1
-                and i < (self.MAP_WIDTH * self.MAP_HEIGHT - self.MAP_WIDTH)
-                and node[2] > 1
-                and self._map[i][0]
-            ):
-                image.putpixel(
-                    (self.X + int(node[0]), self.Y + int(node[1]) * -1), self._map[i][1]
-                )
+        nodes = self._earth_nodes
+        visible = self._draw_mask & (nodes[:, 2] > 1)
+
+        xs = self.X + nodes[visible, 0].astype(int)
+        ys = self.Y - nodes[visible, 1].astype(int)
+
+        frame[ys, xs] = self.EARTH_COLOR[:3]
+
+        # Draw the ISS and home.
+        self.draw_marker(frame, self._iss_nodes[0], self.ISS_COLOR)
+        self.draw_marker(frame, self._home_nodes[0], self.HOME_COLOR)
+
+    def draw_from_table(self, frame):
+        """
+        Draws the current spin step from the precomputed table.
+        Only the ISS and home nodes are transformed per frame.
+        """
+        start = self._spin_offsets[self._current_step]
+        end = self._spin_offsets[self._current_step + 1]
+        coords = self._spin_coords[start:end]
+
+        frame[coords[:, 1], coords[:, 0]] = self.EARTH_COLOR[:3]
+
+        transform = self._spin_transforms[self._current_step]
+
+        self.draw_marker(frame, (self._iss_nodes @ transform)[0], self.ISS_COLOR)
+        self.draw_marker(frame, (self._home_nodes @ transform)[0], self.HOME_COLOR)
+
+    def build_spin_table(self, table_budget):
+        """
+        Precomputes the visible screen pixels for every step of a full rotation.
+        Pixels are packed as uint8 (x, y) pairs with an offset into the table per step.
+        The table is discarded if it grows larger than table_budget bytes.
+        """
+        spin_matrix = self.get_spin_matrix()
 
-        # Draw the ISS.
-        iss_x = int(self._iss_nodes[0][0])
-        iss_y = int(self._iss_nodes[0][1])
-        iss_z = self._iss_nodes[0][2]
+        coords = []
+        offsets = [0]
+        transforms = []
 
-        if iss_z > 1:
-            image.putpixel((self.X + iss_x, self.Y + iss_y * -1), self.ISS_COLOR)
+        table_size = 0
 
-        # Draw home.
-        home_x = int(self._home_nodes[0][0])
-        home_y = int(self._home_nodes[0][1])
-        home_z = self._home_nodes[0][2]
+        cumulative = np.identity(4)
+        current_spin = 0
 
-        if home_z > 1:
-            image.putpixel((self.X + home_x, self.Y + home_y * -1), self.HOME_COLOR)
+        while True:
+            nodes = self._earth_nodes
+            visible = self._draw_mask & (nodes[:, 2] > 1)
+
+            step_coords = np.empty((np.count_nonzero(visible), 2), dtype=np.uint8)
+            step_coords[:, 0] = self.X + nodes[visible, 0].astype(int)
+            step_coords[:, 1] = self.Y - nodes[visible, 1].astype(int)
+
+            coords.append(step_coords)
+            offsets.append(offsets[-1] + len(step_coords))
+            transforms.append(cumulative)
+
+            table_size += step_coords.nbytes + cumulative.nbytes + 4
+            if table_size > table_budget:
+                self.log(f"Spin table exceeds {table_budget} bytes. Drawing live instead.")
+                self._earth_nodes = np.copy(self._earth_nodes_backup)
+                return
+
+            # Mirror the reset check in update_spin.
+            current_spin += self.SPIN_THETA
+            if current_spin >= 2 * pi:
+                break
+
+            transform = self.get_transform(spin_matrix)
+            self._earth_nodes = self._earth_nodes @ transform
+            cumulative = cumulative @ transform
+
+        self._earth_nodes = np.copy(self._earth_nodes_backup)
+
+        self._spin_coords = np.concatenate(coords)
+        self._spin_offsets = np.array(offsets, dtype=np.int32)
+        self._spin_transforms = np.array(transforms)
+        self._current_step = 0
+
+        self.log(f"Spin table built: {len(transforms)} steps, {table_size} bytes.")
+
+    def draw_marker(self, frame, node, color):
+        """
+        Draws a single node into the frame buffer if it is on the visible side.
+        """
+        if node[2] > 1:
+            frame[self.Y - int(node[1]), self.X + int(node[0])] = color[:3]
 
     def add_tilt(self):
         """
@@ -392,19 +545,14 @@ class Earth:
 
         matrix_x = np.array([[c, -s, 0, 0], [s, c, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
 
-        tilted_nodes = np.copy(self._earth_nodes)
-
         center = self.find_center()
 
-        for i, node in enumerate(tilted_nodes):
-            tilted_nodes[i] = center + np.matmul(matrix_x, node - center)
-
-        return tilted_nodes
+        return center + (self._earth_nodes - center) @ matrix_x.T
 
     def convert_map(self):
         """
         Converts the PNG image of the world map to one that can be projected onto the sphere.
-        Turns the pixels in an array of bits.
+        Turns the pixels into a boolean mask of the nodes that should be drawn.
         """
         # Open the map image.
         path = os.path.join(Config.SRC_BASE, "assets", "iss_view", "world-map.png")
@@ -415,26 +563,31 @@ class Earth:
         flipped = ImageOps.mirror(resized)
         shifted = ImageChops.offset(flipped, self.MAP_CALIBRATION, 0)
 
-        # Convert to bit array.
-        for y in range(shifted.height):
-            for x in range(shifted.width):
-                pixel = shifted.getpixel((x, y))
-                self._map.append((int(pixel != (0, 0, 0)), self.EARTH_COLOR))
+        # Convert to a mask of land nodes.
+        land = np.asarray(shifted).any(axis=2).ravel()
+
+        # Skip the rows at the poles.
+        index = np.arange(len(land))
+        in_range = (index > self.MAP_WIDTH - 1) & (
+            index < (self.MAP_WIDTH * self.MAP_HEIGHT - self.MAP_WIDTH)
+        )
+
+        self._draw_mask = land & in_range
 
     def update_coords(self):
         """
         Updates the coordinates for the ISS.
         """
-        global iss_coords
+        iss_coords = iss_store.get().data["coords"]
         self._iss_coords = self.convert_coords(
             radians(90 - iss_coords[0]), radians(180 - iss_coords[1])
         )
 
+    def log(self, text):
+        print(f"Earth - {text}")
+
 
 def request_thread():
-    global iss_coords
-    global number_ast
-    global api_error
     api_connection = APIConnection()
 
     while True:
@@ -442,13 +595,16 @@ def request_thread():
         iss_return = api_connection.get_iss_coords()
         ast_return = api_connection.get_ast_number()
 
-        api_error = iss_return == None or ast_return == None
+        data = dict(iss_store.get().data)
+        data["error"] = iss_return == None or ast_return == None
 
         if iss_return != None:
-            iss_coords = iss_return
+            data["coords"] = iss_return
 
         if ast_return != None:
-            number_ast = ast_return
+            data["astronauts"] = ast_return
+
+        iss_store.publish(data)
 
         request_e.clear()
 
@@ -457,12 +613,15 @@ class APIConnection:
     ISS_ENDPOINT = "http://api.open-notify.org/iss-now.json"
     AST_ENDPOINT = "http://api.open-notify.org/astros.json"
 
+    def __init__(self, client=shared_client):
+        self._client = client
+
     def get_iss_coords(self):
         """
         Sends a request to the ISS API to get its location.
         """
         try:
-            loc = requests.get(self.ISS_ENDPOINT).json()
+            loc = self._client.get(self.ISS_ENDPOINT).json()
         except (requests.exceptions.RequestException, json.decoder.JSONDecodeError):
             return None
 
@@ -476,7 +635,7 @@ class APIConnection:
         Sends a request to get the number of astronauts on the ISS.
         """
         try:
-            results = requests.get(self.AST_ENDPOINT).json()
+            results = self._client.get(self.AST_ENDPOINT, revalidate=True).json()
         except (requests.exceptions.RequestException, json.decoder.JSONDecodeError):
             return None
 
@@ -1,27 +1,32 @@
 from urllib import request
-from PIL import Image, ImageDraw, ImageFont
-from requests import Session, api
+from PIL import Image, ImageDraw
 import requests
 import json
 import threading
 import time
-from common import msleep
-import os
+from http_client import shared_client
+from snapshot import SnapshotStore
 import subprocess
 
 from views.network_view.traffic_graph import TrafficGraph
 
+from assets import Assets
 from config import Config
-
-initial_api_updated = False
-api_error = False
-
-pihole_data = None
-health_data = None
-ping_data = None
-traffic_interval_data = None
+from fonts import Fonts
+
+# Published by the request thread, read by the view.
+network_store = SnapshotStore(
+    {
+        "pihole": None,
+        "health": None,
+        "ping": None,
+        "traffic_interval": None,
+        "error": False
+    }
+)
 
 request_e = threading.Event()
+request_t = None
 
 class NetworkMonitor:
     API_INTERVAL = 8 # s.
@@ -29,26 +34,27 @@ class NetworkMonitor:
     REFRESH_INTERVAL = 150 # ms.
     BG_COLOR = "black"
 
+    ASSET_GROUPS = ["network_icons"]  # Warmed when the view is configured.
+
     def __init__(self, matrix, press_event):
         self._matrix = matrix
         self._press_event = press_event
 
         self._start_time = time.time()
 
-        self._request_t = threading.Thread(name="requests", target=request_thread)
-        self._request_t.daemon = True
-        self._request_t.start()
+        # Start the request thread once, even if the view is built again.
+        global request_t
+        if request_t is None:
+            request_t = threading.Thread(name="requests", target=request_thread)
+            request_t.daemon = True
+            request_t.start()
 
     def run(self):
-        global initial_api_updated
-        global api_error
-
-        initial_api_updated = False
-
+        # Wait for data requested after the view started.
+        version = network_store.get().version
         request_e.set()
 
-        while not initial_api_updated:
-            msleep(200)
+        network_store.wait(version)
 
         last_refresh = 0
 
@@ -58,24 +64,26 @@ class NetworkMonitor:
             if current_t - last_refresh >= self.API_INTERVAL:
                 last_refresh = current_t
 
+                data = network_store.get().data
+
                 image = Image.new("RGB", self._matrix.dimensions, color=self.BG_COLOR)
 
-                if api_error:
+                if data["error"]:
                     self.draw_error(image)
 
                 self.draw_time(image)
-                self.draw_clients(image)
-                self.draw_pihole(image)
-                self.draw_ping(image)
+                self.draw_clients(image, data["health"])
+                self.draw_pihole(image, data["pihole"])
+                self.draw_ping(image, data["ping"])
 
-                TrafficGraph.draw_graph(image, traffic_interval_data)
-                TrafficGraph.draw_tx_rx(image, health_data)
+                TrafficGraph.draw_graph(image, data["traffic_interval"])
+                TrafficGraph.draw_tx_rx(image, data["health"])
 
                 self._matrix.set_image(image)
 
             self.check_api_interval()
 
-            msleep(self.REFRESH_INTERVAL)
+            self._press_event.wait(self.REFRESH_INTERVAL / 1000)
 
     def check_api_interval(self):
         current_time = time.time()
@@ -124,70 +132,64 @@ class NetworkMonitor:
 
         color = "lightpink"
 
-        font_path = os.path.join(Config.FONTS, "resolution-3x4.ttf")
         font_size = 4
 
-        f = ImageFont.truetype(font_path, font_size)
-        d = ImageDraw.Draw(image)
+        f = Fonts.get("resolution-3x4", font_size)
 
         time_str = time.strftime("%I:%M %p")
 
-        d.text(
+        f.draw(
+            image,
             (x_offset, y_offset),
             time_str,
-            font=f,
-            fill=color
+            color
         )
 
-    def draw_clients(self, image):
+    def draw_clients(self, image, health_data):
         x_offset = 2
         y_offset = 9
 
         color = "rosybrown"
 
-        font_path = os.path.join(Config.FONTS, "resolution-3x4.ttf")
         font_size = 4
 
-        f = ImageFont.truetype(font_path, font_size)
-        d = ImageDraw.Draw(image)
+        f = Fonts.get("resolution-3x4", font_size)
 
         num_clients = health_data[1]["num_sta"]
 
         client_str = f"{num_clients} clnts"
 
-        d.text(
+        f.draw(
+            image,
             (x_offset, y_offset),
             client_str,
-            font=f,
-            fill=color
+            color
         )
 
-    def draw_ping(self, image):
+    def draw_ping(self, image, ping_data):
         x_offset = 1
         y_offset = 9
 
         color = "rosybrown"
 
-        font_path = os.path.join(Config.FONTS, "resolution-3x4.ttf")
         font_size = 4
 
-        f = ImageFont.truetype(font_path, font_size)
-        d = ImageDraw.Draw(image)
+        f = Fonts.get("resolution-3x4", font_size)
 
         ms_str = str(round(ping_data, 1)) + " ms"
-        ms_length = int(d.textlength(ms_str, f))
+        ms_length = int(f.length(ms_str))
 
-        d.text(
+        f.draw(
+            image,
             (
                 self._matrix.dimensions[0] - ms_length - x_offset,
                 y_offset
             ),
             ms_str,
-            font=f,
-            fill=color
+            color
         )
 
-    def draw_pihole(self, image):
+    def draw_pihole(self, image, pihole_data):
         x_offset = 1
         y_offset = 1
 
@@ -203,16 +205,14 @@ class NetworkMonitor:
 
         color = "lightcoral"
 
-        font_path = os.path.join(Config.FONTS, "cg-pixel-4x5.ttf")
         font_size = 5
 
-        f = ImageFont.truetype(font_path, font_size)
-        d = ImageDraw.Draw(image)
+        f = Fonts.get("cg-pixel-4x5", font_size)
 
         percent = round(float(pihole_data["ads_percentage_today"]), 1)
 
         percent_str = f"{percent}%"
-        percent_length = int(d.textlength(percent_str, f))
+        percent_length = int(f.length(percent_str))
 
         if len(percent_str) <= 4:
             x_spacing += 3
@@ -228,33 +228,20 @@ class NetworkMonitor:
             )
         )
 
-        d.text(
+        f.draw(
+            image,
             (
                 self._matrix.dimensions[0] - percent_length - x_offset,
                 y_offset + ((icon_size / 2) - (font_size / 2))
             ),
             percent_str,
-            font=f,
-            fill=color
+            color
         )
 
     def get_icon(self, code, size):
-        path = os.path.join(Config.SRC_BASE, "assets", "network_view", f"{code}.png")
-        image = Image.open(path)
-
-        resized = image.resize((size, size), Image.BOX)
-
-        return resized
+        return Assets.get("network_icons", code, size)
 
 def request_thread():
-    global api_error
-
-    global initial_api_updated
-    global pihole_data
-    global health_data
-    global traffic_interval_data
-    global ping_data
-
     unifi = UnifiConnection()
     pihole = PiHoleConnection()
     ping = PingConnection()
@@ -321,7 +308,15 @@ def request_thread():
 
         request_e.clear()
 
-        initial_api_updated = True
+        network_store.publish(
+            {
+                "pihole": pihole_data,
+                "health": health_data,
+                "ping": ping_data,
+                "traffic_interval": traffic_interval_data,
+                "error": api_error
+            }
+        )
 
 class PingConnection:
     ENDPOINT = "8.8.8.8"
@@ -341,9 +336,12 @@ class PingConnection:
 class PiHoleConnection:
     ENDPOINT = "https://pihole.lab.jameslowther.com/admin/api.php"
 
+    def __init__(self, client=shared_client):
+        self._client = client
+
     def update(self):
         try:
-            data = requests.get(
+            data = self._client.get(
                 f"{self.ENDPOINT}?summary&auth={Config.ENV_VALUES['PIHOLE_API_TOKEN']}"
             ).json()
 
@@ -355,8 +353,9 @@ class UnifiConnection:
     ENDPOINT = "https://unifi.lab.jameslowther.com"
     SITE = "default"
 
-    def __init__(self):
-        self._session = Session()
+    def __init__(self, client=shared_client):
+        # The client's session for the controller keeps the login cookie.
+        self._client = client
 
         self.login()
 
@@ -367,7 +366,7 @@ class UnifiConnection:
         """
 
         try:
-            self._session.post(
+            self._client.post(
                 f"{self.ENDPOINT}/api/login",
                 json={
                     "username": Config.ENV_VALUES["UNIFI_USERNAME"],
@@ -386,7 +385,7 @@ class UnifiConnection:
         Logout of the Unifi controller.
         Deletes the cookie for the session.
         """
-        self._session.post(
+        self._client.post(
             f"{self.ENDPOINT}/api/logout",
             verify=False
         )
@@ -406,7 +405,7 @@ class UnifiConnection:
         data = None
         for _ in range(retry_attempts):
             try:
-                data = self._session.post(
+                data = self._client.post(
                     f"{self.ENDPOINT}/api/s/{self.SITE}/stat/report/5minutes.site",
                     json={
                         "start": start,
@@ -435,7 +434,7 @@ class UnifiConnection:
         data = None
         for _ in range(retry_attempts):
             try:
-                data = self._session.get(
+                data = self._client.get(
                     f"{self.ENDPOINT}/api/s/{self.SITE}/stat/health",
                     verify=False
                 ).json()
@@ -1,7 +1,5 @@
-from PIL import ImageDraw, ImageFont
-from config import Config
-
-import os
+from PIL import ImageDraw
+from fonts import Fonts
 
 class TrafficGraph:
 
@@ -14,11 +12,9 @@ class TrafficGraph:
 
         y_spacing = 2
 
-        font_path = os.path.join(Config.FONTS, "resolution-3x4.ttf")
         font_size = 4
 
-        f = ImageFont.truetype(font_path, font_size)
-        d = ImageDraw.Draw(image)
+        f = Fonts.get("resolution-3x4", font_size)
 
         wan_data = health_data[1]
 
@@ -31,27 +27,27 @@ class TrafficGraph:
         if len(tx_str) <= 6 and len(rx_str) <= 6:
             x_offset = 1
 
-        tx_length = int(d.textlength(tx_str, f))
-        rx_length = int(d.textlength(rx_str, f))
+        tx_length = int(f.length(tx_str))
+        rx_length = int(f.length(rx_str))
 
-        d.text(
+        f.draw(
+            image,
             [
                 64 - tx_length - x_offset,
                 y_offset
             ],
             tx_str,
-            font=f,
-            fill=tx_color
+            tx_color
         )
 
-        d.text(
+        f.draw(
+            image,
             [
                 64 - rx_length - x_offset,
                 y_offset + (font_size + 1) + y_spacing
             ],
             rx_str,
-            font=f,
-            fill=rx_color
+            rx_color
         )
 
     def draw_graph(image, traffic_data):
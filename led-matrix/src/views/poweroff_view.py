@@ -1,7 +1,5 @@
-from PIL import Image, ImageFont, ImageDraw
-import time
-import os
-from config import Config
+from PIL import Image
+from fonts import Fonts
 
 
 class PoweroffView:
@@ -26,20 +24,18 @@ class PoweroffView:
         for i in range(self.COUNTDOWN, 0, -1):
             image = Image.new("RGB", self._matrix.dimensions, color="black")
 
-            font_path = os.path.join(Config.FONTS, "6px-Normal.ttf")
             font_size = 8
 
-            f = ImageFont.truetype(font_path, font_size)
-            d = ImageDraw.Draw(image)
+            f = Fonts.get("6px-Normal", font_size)
 
             text_1_str = "Shutting down in"
-            text_1_length = int(d.textlength(text_1_str, f))
+            text_1_length = int(f.length(text_1_str))
 
-            d.text(
+            f.draw(
+                image,
                 ((self._matrix.dimensions[0] / 2) - (text_1_length / 2), y_offset),
                 text_1_str,
-                font=f,
-                fill=(170, 170, 170),
+                (170, 170, 170),
             )
 
             if i == 1:
@@ -47,34 +43,34 @@ class PoweroffView:
             else:
                 text_2_str = f"{i} seconds"
 
-            text_2_length = int(d.textlength(text_2_str, f))
+            text_2_length = int(f.length(text_2_str))
 
-            d.text(
+            f.draw(
+                image,
                 (
                     (self._matrix.dimensions[0] / 2) - (text_2_length / 2),
                     y_offset + spacing,
                 ),
                 text_2_str,
-                font=f,
-                fill=(170, 170, 170),
+                (170, 170, 170),
             )
 
             text_3_str = "PRESS TO CANCEL"
-            text_3_length = int(d.textlength(text_3_str, f))
+            text_3_length = int(f.length(text_3_str))
 
-            d.text(
+            f.draw(
+                image,
                 (
                     (self._matrix.dimensions[0] / 2) - (text_3_length / 2),
                     y_offset + spacing + spacing_2,
                 ),
                 text_3_str,
-                font=f,
-                fill=(184, 134, 11),
+                (184, 134, 11),
             )
 
             self._matrix.set_image(image)
 
-            time.sleep(1)
+            self._press_event.wait(1)
 
             if self._long_press_event.is_set():
                 return "switch_mode"
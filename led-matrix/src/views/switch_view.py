@@ -1,7 +1,6 @@
-from PIL import Image, ImageFont, ImageDraw
-from config import Config
+from PIL import Image
+from fonts import Fonts
 import time
-import os
 
 class SwitchView:
     COLORS = {
@@ -27,15 +26,13 @@ class SwitchView:
 
             image = Image.new("RGB", self._matrix.dimensions, color="black")
 
-            font_path = os.path.join(Config.FONTS, "6px-Normal.ttf")
             font_size = 8
 
-            f = ImageFont.truetype(font_path, font_size)
-            d = ImageDraw.Draw(image)
+            f = Fonts.get("6px-Normal", font_size)
 
             top_str = "Mode set to"
             top_color = (170, 170, 170)
-            top_length = int(d.textlength(top_str, f))
+            top_length = int(f.length(top_str))
 
             bottom_str = modes[new_mode_i].upper()
 
@@ -45,26 +42,26 @@ class SwitchView:
             except KeyError:
                 bottom_color = "DarkViolet"
 
-            bottom_length = int(d.textlength(bottom_str, f))
+            bottom_length = int(f.length(bottom_str))
 
-            d.text(
+            f.draw(
+                image,
                 [
                     (self._matrix.dimensions[0] / 2) - (top_length / 2),
                     y_offset
                 ],
                 top_str,
-                font=f,
-                fill=top_color
+                top_color
             )
 
-            d.text(
+            f.draw(
+                image,
                 [
                     (self._matrix.dimensions[0] / 2) - (bottom_length / 2) + x_offset,
                     y_offset + y_spacing
                 ],
                 bottom_str,
-                font=f,
-                fill=bottom_color
+                bottom_color
             )
 
             self._matrix.set_image(image)
@@ -3,6 +3,8 @@ import time
 import numpy as np
 from math import pi, sin, cos
 
+from common import FrameClock
+
 class TestView:
     def __init__(self, matrix, press_event):
         self.matrix = matrix
@@ -46,6 +48,7 @@ class TestView:
 
         theta = 0.03
         bgcolor = "black"
+        clock = FrameClock(30)
         while not self._press_event.is_set():
             image = Image.new("RGB", self.matrix.dimensions, color=bgcolor)
 
@@ -61,7 +64,9 @@ class TestView:
 
             self.matrix.set_image(image)
 
-            time.sleep(0.03)
+            clock.tick()
+
+        clock.log_stats("TestView")
 
     def rotate_object(self, obj, theta):
         center = obj.find_center()
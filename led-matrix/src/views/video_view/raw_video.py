@@ -0,0 +1,196 @@
+from PIL import Image
+import numpy as np
+import mmap
+import struct
+
+# Raw video layout:
+#   header  - magic, version, compression, width, height, fps, frame count, index offset
+#   palette - 256 RGB entries (indexed only)
+#   frames  - RGB888 frames or uint8 palette indices, stored back to back
+#   index   - frame count + 1 uint64 offsets (RLE only, other frames are fixed size)
+MAGIC = b"LEDV"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHHHIQ")
+
+EXTENSION = ".ledv"
+
+COMPRESSION_NONE = 0
+COMPRESSION_RLE = 1
+COMPRESSION_INDEXED = 2
+
+PALETTE_SIZE = 256
+
+class RawVideoWriter:
+    """
+    Writes frames to a raw video file.
+    """
+    def __init__(self, path, width, height, fps, compression=COMPRESSION_NONE, palette=None):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.compression = compression
+
+        self._file = open(path, "wb")
+        self._file.write(b"\0" * HEADER.size)
+
+        if compression == COMPRESSION_INDEXED:
+            padded = np.zeros((PALETTE_SIZE, 3), dtype=np.uint8)
+            padded[:len(palette)] = palette
+            self._file.write(padded.tobytes())
+
+        self._offsets = [self._file.tell()]
+
+    def write_frame(self, frame):
+        """
+        Appends a (height, width, 3) RGB uint8 frame.
+        Indexed videos take a (height, width) uint8 frame of palette indices.
+        """
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+
+        if self.compression == COMPRESSION_INDEXED:
+            shape = (self.height, self.width)
+        else:
+            shape = (self.height, self.width, 3)
+
+        if frame.shape != shape:
+            raise ValueError(f"Frame shape {frame.shape} doesn't match {shape}.")
+
+        if self.compression == COMPRESSION_RLE:
+            data = rle_encode(frame)
+        else:
+            data = frame.tobytes()
+
+        self._file.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+
+    def close(self):
+        """
+        Writes the index and header and closes the file.
+        """
+        frame_count = len(self._offsets) - 1
+        index_offset = 0
+
+        if self.compression == COMPRESSION_RLE:
+            index_offset = self._offsets[-1]
+            self._file.write(np.array(self._offsets, dtype="<u8").tobytes())
+
+        self._file.seek(0)
+        self._file.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                self.compression,
+                self.width,
+                self.height,
+                self.fps,
+                frame_count,
+                index_offset,
+            )
+        )
+        self._file.close()
+
+class RawVideo:
+    """
+    Memory-maps a raw video file and returns its frames without decoding them.
+    """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, compression, width, height, fps, frame_count, index_offset = HEADER.unpack_from(self._mmap)
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a raw video file.")
+
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frame_count = frame_count
+        self.compression = compression
+
+        self._frame_size = width * height * 3
+        self._frames_start = HEADER.size
+
+        self._offsets = None
+        self._palette = None
+
+        if compression == COMPRESSION_RLE:
+            self._offsets = np.frombuffer(self._mmap, dtype="<u8", count=frame_count + 1, offset=index_offset)
+
+        elif compression == COMPRESSION_INDEXED:
+            self._palette = np.frombuffer(self._mmap, dtype=np.uint8, count=PALETTE_SIZE * 3, offset=HEADER.size).reshape(-1, 3)
+            self._frame_size = width * height
+            self._frames_start += PALETTE_SIZE * 3
+
+    def __len__(self):
+        return self.frame_count
+
+    def get_frame_buffer(self, i):
+        """
+        Returns the frame as a memory view into the file.
+        Only possible for uncompressed and indexed videos.
+        """
+        start = self._frames_start + i * self._frame_size
+
+        return memoryview(self._mmap)[start:start + self._frame_size]
+
+    def get_frame(self, i):
+        """
+        Returns the frame as an RGB image.
+        """
+        if self._palette is not None:
+            indices = np.frombuffer(self.get_frame_buffer(i), dtype=np.uint8)
+            data = np.take(self._palette, indices, axis=0).tobytes()
+
+        elif self._offsets is None:
+            data = self.get_frame_buffer(i)
+
+        else:
+            start = int(self._offsets[i])
+            end = int(self._offsets[i + 1])
+            data = rle_decode(memoryview(self._mmap)[start:end])
+
+        return Image.frombuffer("RGB", (self.width, self.height), data, "raw", "RGB", 0, 1)
+
+    def close(self):
+        """
+        Drops the references to the mapped file.
+        The mapping is released once the last frame using it is gone.
+        """
+        self._offsets = None
+        self._palette = None
+        self._mmap = None
+
+def rle_encode(frame):
+    """
+    Encodes a frame as runs of identical pixels.
+    Layout: uint32 run count, uint16 run lengths, RGB pixel per run.
+    """
+    pixels = frame.reshape(-1, 3)
+
+    # Start a new run wherever the pixel changes or a run would overflow.
+    changes = np.flatnonzero(np.any(pixels[1:] != pixels[:-1], axis=1)) + 1
+    starts = np.concatenate(([0], changes))
+    lengths = np.diff(np.concatenate((starts, [len(pixels)])))
+
+    max_run = np.iinfo(np.uint16).max
+    if lengths.max() > max_run:
+        starts = np.concatenate([np.arange(s, s + l, max_run) for s, l in zip(starts, lengths)])
+        lengths = np.diff(np.concatenate((starts, [len(pixels)])))
+
+    return (
+        struct.pack("<I", len(starts))
+        + lengths.astype("<u2").tobytes()
+        + pixels[starts].tobytes()
+    )
+
+def rle_decode(data):
+    """
+    Decodes a frame encoded by rle_encode into RGB bytes.
+    """
+    runs = struct.unpack_from("<I", data)[0]
+
+    lengths = np.frombuffer(data, dtype="<u2", count=runs, offset=4)
+    pixels = np.frombuffer(data, dtype=np.uint8, count=runs * 3, offset=4 + runs * 2).reshape(-1, 3)
+
+    return np.repeat(pixels, lengths, axis=0).tobytes()
@@ -1,41 +1,188 @@
 from PIL import Image
-from common import msleep
+from common import FrameClock
 from config import Config
+from views.video_view.raw_video import RawVideo, EXTENSION
 
 import os
 import json
+import queue
 import tarfile
+import threading
 import io
 
 class VideoView:
-    def __init__(self, matrix, press_event, video, loop=True):
+    BUFFER_FRAMES = 16  # Frames decoded ahead when streaming.
+
+    def __init__(self, matrix, press_event, video, loop=True, stream=True):
         self._matrix = matrix
         self._press_event = press_event
 
         self._loop = loop
+        self._stream = stream
 
         self._video = video
+        self._path = os.path.join(Config.ASSETS_PATH, "video_view", f"{self._video}.tar.gz")
+        self._raw_path = os.path.join(Config.ASSETS_PATH, "video_view", f"{self._video}{EXTENSION}")
         self._sleep = 100
         self._frames = []
+        self._stream_ahead = None
+
+        # Prefer the raw format when the video has been converted to it.
+        self._raw = os.path.exists(self._raw_path)
 
-        self._valid_data = self.load_video()
+        if self._raw:
+            self._valid_data = self.load_raw_metadata()
+        elif self._stream:
+            self._valid_data = self.load_metadata()
+        else:
+            self._valid_data = self.load_video()
 
     def run(self):
         if not self._valid_data:
             return
 
-        current_frame = 0
-        while not self._press_event.is_set():
-            self._matrix.set_image(self._frames[current_frame])
-            msleep(self._sleep)
+        if self._raw:
+            return self.run_raw()
 
-            if not self._loop and current_frame == (len(self._frames) - 1):
-                return True
+        if self._stream:
+            return self.run_stream()
+
+        clock = FrameClock(self._sleep)
+
+        try:
+            current_frame = 0
+            while not self._press_event.is_set():
+                self._matrix.set_image(self._frames[current_frame])
+                next_frame = current_frame + 1 + clock.tick()
+
+                if not self._loop and next_frame >= len(self._frames):
+                    return True
+
+                current_frame = next_frame % len(self._frames)
+        finally:
+            clock.log_stats(self.get_name())
+
+    def run_stream(self):
+        """
+        Plays the video while a background thread decodes the frames ahead.
+        Nothing is kept in memory once the view stops.
+        """
+        stream = self._stream_ahead or self.start_stream()
+        self._stream_ahead = None
+
+        clock = FrameClock(self._sleep)
+        skip = 0
+
+        try:
+            while not self._press_event.is_set():
+                try:
+                    frame = stream.get_frame()
+                except queue.Empty:
+                    continue
+
+                # End of the stream. Either the video doesn't loop or it
+                # couldn't be decoded.
+                if frame is None:
+                    if stream.error is not None:
+                        self.log(f"Failed to decode {self._path}: {stream.error}")
+                        return False
+
+                    return True
+
+                # Drop frames the clock fell behind on.
+                if skip > 0:
+                    skip -= 1
+                    continue
+
+                self._matrix.set_image(frame)
+                skip = clock.tick()
+        finally:
+            stream.stop()
+            clock.log_stats(self.get_name())
+
+    def run_raw(self):
+        """
+        Plays a raw video straight out of the memory-mapped file.
+        """
+        video = RawVideo(self._raw_path)
+        clock = FrameClock(self._sleep)
+
+        try:
+            current_frame = 0
+            while not self._press_event.is_set():
+                self._matrix.set_image(video.get_frame(current_frame))
+                next_frame = current_frame + 1 + clock.tick()
+
+                if not self._loop and next_frame >= len(video):
+                    return True
+
+                current_frame = next_frame % len(video)
+        finally:
+            video.close()
+            clock.log_stats(self.get_name())
+
+    def prefetch(self):
+        """
+        Starts decoding a streamed video so its first frames are ready when it is shown.
+        """
+        if self._valid_data and self._stream and not self._raw and self._stream_ahead is None:
+            self._stream_ahead = self.start_stream()
+
+    def start_stream(self):
+        stream = FrameStream(self._path, self.BUFFER_FRAMES, self._loop)
+        stream.start()
+
+        return stream
+
+    def close(self):
+        """
+        Stops a stream started by prefetch() that was never played.
+        """
+        if self._stream_ahead is not None:
+            self._stream_ahead.stop()
+            self._stream_ahead = None
+
+    def get_name(self):
+        return f"VideoView ({self._video})"
+
+    def log(self, text):
+        print(f"{self.get_name()} - {text}")
+
+    def load_raw_metadata(self):
+        """
+        Reads the fps from the raw video header.
+        """
+        try:
+            video = RawVideo(self._raw_path)
+        except ValueError:
+            return False
+
+        self._sleep = (1000 // video.fps)
+        valid = len(video) > 0
+
+        video.close()
+
+        return valid
 
-            current_frame = (current_frame + 1) % len(self._frames)
+    def load_metadata(self):
+        """
+        Reads the fps from the archive without decoding any frames.
+        The archive is read as a stream and only up to the metadata.
+        """
+        if not (os.path.exists(self._path) and tarfile.is_tarfile(self._path)):
+            return False
+
+        with tarfile.open(self._path, "r|gz") as tar:
+            for member in tar:
+                if "metadata.json" in member.name:
+                    meta_data = json.load(tar.extractfile(member))
+                    self._sleep = (1000 // meta_data["fps"])
+                    break
+
+        return True
 
     def load_video(self):
-        path = os.path.join(Config.ASSETS_PATH, "video_view", f"{self._video}.tar.gz")
+        path = self._path
 
         if not (os.path.exists(path) and tarfile.is_tarfile(path)):
             return False
@@ -49,7 +196,92 @@ class VideoView:
                 self._sleep = (1000 // meta_data["fps"])
                 continue
 
-            frame = tar.extractfile(member).read()
-            self._frames.append(Image.open(io.BytesIO(frame)))
+            frame = Image.open(io.BytesIO(tar.extractfile(member).read()))
+
+            # Indexed frames are expanded once here rather than on every draw.
+            if frame.mode != "RGB":
+                frame = frame.convert("RGB")
+
+            self._frames.append(frame)
 
         return True
+
+class FrameStream(threading.Thread):
+    """
+    Decodes the frames of a video archive into a bounded queue.
+    The stream ends with None, after the last frame of a video that doesn't
+    loop or when the archive can't be decoded. The error is kept in error.
+    """
+    def __init__(self, path, buffer_frames, loop):
+        threading.Thread.__init__(self, name="video_stream")
+        self.daemon = True
+
+        self._path = path
+        self._loop = loop
+
+        self._queue = queue.Queue(maxsize=buffer_frames)
+        self._stop_event = threading.Event()
+
+        self.error = None
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                decoded = 0
+
+                with tarfile.open(self._path, "r|gz") as tar:
+                    for member in tar:
+                        if "metadata.json" in member.name or not member.isfile():
+                            continue
+
+                        frame = Image.open(io.BytesIO(tar.extractfile(member).read()))
+                        frame.load()
+
+                        if frame.mode != "RGB":
+                            frame = frame.convert("RGB")
+
+                        if not self.put(frame):
+                            return
+
+                        decoded += 1
+
+                # Looping an archive without frames would never end.
+                if decoded == 0:
+                    raise ValueError("no frames in the archive")
+
+                if not self._loop:
+                    break
+
+        except Exception as e:
+            self.error = e
+
+        self.put(None)
+
+    def put(self, frame):
+        """
+        Waits for space in the queue. Returns False if the stream was stopped.
+        """
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(frame, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def get_frame(self, timeout=0.1):
+        """
+        Returns the next decoded frame, or None at the end of the stream.
+        Raises queue.Empty if no frame was decoded in time.
+        """
+        return self._queue.get(timeout=timeout)
+
+    def stop(self):
+        """
+        Stops decoding and drops any buffered frames.
+        """
+        self._stop_event.set()
+        self.join()
+
+        self._queue = None
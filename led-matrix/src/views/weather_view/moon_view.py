@@ -1,8 +1,8 @@
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
 from datetime import datetime
-import os
 
-from config import Config
+from assets import Assets
+from fonts import Fonts
 
 class MoonView:
     BG_COLOR = "black"
@@ -78,11 +78,9 @@ class MoonView:
 
         color = (170, 170, 170)
 
-        font_path = os.path.join(Config.FONTS, "cg-pixel-4x5.ttf")
         font_size = 5
 
-        f = ImageFont.truetype(font_path, font_size)
-        d = ImageDraw.Draw(image)
+        f = Fonts.get("cg-pixel-4x5", font_size)
 
         phase = self._moon_phase["phase"]
         phase_s = phase.split(" ")
@@ -90,27 +88,27 @@ class MoonView:
         top_str = phase_s[0]
         bottom_str = phase_s[1]
 
-        top_length = int(d.textlength(top_str, f))
-        bottom_length = int(d.textlength(bottom_str, f))
+        top_length = int(f.length(top_str))
+        bottom_length = int(f.length(bottom_str))
 
-        d.text(
+        f.draw(
+            image,
             (
                 (self._matrix.dimensions[0] / 4) * 3 - (top_length / 2) + x_offset,
                 y_offset
             ),
             top_str,
-            font=f,
-            fill=color
+            color
         )
 
-        d.text(
+        f.draw(
+            image,
             (
                 (self._matrix.dimensions[0] / 4) * 3 - (bottom_length / 2) + x_offset,
                 y_offset + (font_size + 1) + spacing
             ),
             bottom_str,
-            font=f,
-            fill=color
+            color
         )
 
     def draw_moon(self, image):
@@ -121,10 +119,7 @@ class MoonView:
 
         moon_id = self._moon_phase["id"]
 
-        path = os.path.join(Config.SRC_BASE, "assets", "weather_view", "moon_icons", f"{moon_id}.png")
-        image = Image.open(path)
-
-        resized = image.resize((size, size), Image.BOX)
+        resized = Assets.get("moon_icons", str(moon_id), size)
 
         image.paste(
             resized,
@@ -142,22 +137,20 @@ class MoonView:
 
         color = (170, 170, 170)
 
-        font_path = os.path.join(Config.FONTS, "resolution-3x4.ttf")
         font_size = 4
 
-        f = ImageFont.truetype(font_path, font_size)
-        d = ImageDraw.Draw(image)
+        f = Fonts.get("resolution-3x4", font_size)
 
         now = datetime.now()
         date_str = now.strftime("%b. %-d, %Y")
-        date_length = int(d.textlength(date_str, f))
+        date_length = int(f.length(date_str))
 
-        d.text(
+        f.draw(
+            image,
             (
                 (self._matrix.dimensions[0] / 2)- (date_length / 2) + x_offset,
                 y_offset
             ),
             date_str,
-            font=f,
-            fill=color
+            color
         )
@@ -0,0 +1,160 @@
+from PIL import Image
+import hashlib
+import json
+import os
+import threading
+import time
+
+from config import Config
+
+class RadarCache:
+    """
+    Disk cache of converted radar frames.
+    A RainViewer frame never changes once published, so frames are stored
+    under a hash of the path and the options that went into converting them.
+    """
+    MAX_SIZE = 4 * 1024 * 1024  # bytes.
+    MAX_AGE = 3 * 60 * 60  # s. RainViewer only keeps 2 hours of past frames.
+
+    INDEX = "index.json"  # Frames that were last shown, loaded on startup.
+
+    def __init__(self, path=os.path.join(Config.CACHE_PATH, "radar"), max_size=MAX_SIZE, max_age=MAX_AGE):
+        self.path = path
+        self.max_size = max_size
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+
+        try:
+            os.makedirs(self.path, exist_ok=True)
+        except OSError as e:
+            self.log(f"Disabled, can't create {self.path}: {e}")
+            self.path = None
+
+    def get_key(self, *parts):
+        return hashlib.sha1(json.dumps(parts).encode()).hexdigest()
+
+    def get(self, key):
+        """
+        Returns the cached frame, or None if it isn't cached or is too old.
+        """
+        if self.path is None:
+            return None
+
+        file_path = self.get_path(key)
+
+        try:
+            if time.time() - os.path.getmtime(file_path) > self.max_age:
+                return None
+
+            with Image.open(file_path) as image:
+                return image.convert("RGB")
+
+        except OSError:
+            return None
+
+    def put(self, key, image):
+        """
+        Stores a frame and trims the cache back within its limits.
+        """
+        if self.path is None:
+            return
+
+        file_path = self.get_path(key)
+        temp_path = f"{file_path}.{threading.get_ident()}.tmp"
+
+        try:
+            image.save(temp_path, "PNG")
+            os.replace(temp_path, file_path)
+        except OSError as e:
+            self.log(f"Failed to store frame: {e}")
+            return
+
+        self.trim()
+
+    def trim(self):
+        """
+        Deletes frames that are too old, then the oldest frames until the
+        cache fits in its size limit.
+        """
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.path):
+                if not entry.name.endswith(".png"):
+                    continue
+
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            entries.sort()
+            now = time.time()
+            total_size = sum(size for _, size, _ in entries)
+
+            for mtime, size, file_path in entries:
+                if now - mtime <= self.max_age and total_size <= self.max_size:
+                    break
+
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    continue
+
+                total_size -= size
+
+    def save_index(self, frames):
+        """
+        Records the keys and times of the frames being shown.
+        """
+        if self.path is None:
+            return
+
+        index = [{"time": frame["time"], "key": frame["key"]} for frame in frames]
+        temp_path = os.path.join(self.path, f"{self.INDEX}.tmp")
+
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(index, f)
+
+            os.replace(temp_path, os.path.join(self.path, self.INDEX))
+        except OSError as e:
+            self.log(f"Failed to store index: {e}")
+
+    def load_index(self):
+        """
+        Returns the frames that were last shown, or an empty list if any of
+        them are no longer cached.
+        """
+        if self.path is None:
+            return []
+
+        try:
+            with open(os.path.join(self.path, self.INDEX)) as f:
+                index = json.load(f)
+        except (OSError, json.decoder.JSONDecodeError):
+            return []
+
+        frames = []
+        for entry in index:
+            frame = self.get(entry["key"])
+            if frame is None:
+                return []
+
+            frames.append(
+                {
+                    "time": entry["time"],
+                    "key": entry["key"],
+                    "frame": frame
+                }
+            )
+
+        return frames
+
+    def get_path(self, key):
+        return os.path.join(self.path, f"{key}.png")
+
+    def log(self, text):
+        print(f"Radar Cache - {text}")
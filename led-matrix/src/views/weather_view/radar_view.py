@@ -1,8 +1,7 @@
-from PIL import ImageDraw, ImageFont
+from PIL import ImageDraw
 from datetime import datetime
-import os
 
-from config import Config
+from fonts import Fonts
 
 class RadarView:
     LOCATION_COLOR = "lightsteelblue"
@@ -69,24 +68,22 @@ class RadarView:
 
         color = (170, 170, 170)
 
-        font_path = os.path.join(Config.FONTS, "resolution-3x4.ttf")
         font_size = 4
 
-        f = ImageFont.truetype(font_path, font_size)
-        d = ImageDraw.Draw(image)
+        f = Fonts.get("resolution-3x4", font_size)
 
         time_str = datetime.fromtimestamp(time).strftime("%I:%M %p")
         time_str = time_str.lstrip("0")
 
-        text_length = int(d.textlength(time_str, f))
+        text_length = int(f.length(time_str))
         x = self._matrix.dimensions[0] - text_length - x_offset
         y = self._matrix.dimensions[1] - (font_size + 1) - y_offset
 
-        d.text(
+        f.draw(
+            image,
             (
                 x, y
             ),
             time_str,
-            font=f,
-            fill=color
+            color
         )
@@ -1,8 +1,8 @@
-import os
 from datetime import datetime
 
-from PIL import Image, ImageFont, ImageDraw
-from config import Config
+from PIL import Image, ImageDraw
+from assets import Assets
+from fonts import Fonts
 
 class TemperatureView:
     BG_COLOR = "black"
@@ -23,29 +23,26 @@ class TemperatureView:
         return self._temperature_image
 
     def draw_location_text(self):
-        font_path = os.path.join(Config.FONTS, "cg-pixel-4x5.ttf")
         font_size = 5
 
-        f = ImageFont.truetype(font_path, font_size)
-        d = ImageDraw.Draw(self._temperature_image)
+        f = Fonts.get("cg-pixel-4x5", font_size)
 
         x_offset = 2
         y_offset = 2
 
         color = (170, 170, 170)
 
-        d.text(
+        f.draw(
+            self._temperature_image,
             (x_offset, y_offset),
             self._location,
-            font=f,
-            fill=color
+            color
         )
 
     def draw_current_temp(self):
-        font_path = os.path.join(Config.FONTS, "cg-pixel-4x5.ttf")
         font_size = 5
 
-        f = ImageFont.truetype(font_path, font_size)
+        f = Fonts.get("cg-pixel-4x5", font_size)
         d = ImageDraw.Draw(self._temperature_image)
 
         x_offset = 2
@@ -59,16 +56,16 @@ class TemperatureView:
 
         current_temp = str(int(data["feels_like"] - 273.15))
 
-        length = int(d.textlength(current_temp, f))
+        length = int(f.length(current_temp))
 
-        d.text(
+        f.draw(
+            self._temperature_image,
             (
                 self._matrix.dimensions[0] - length - x_offset - radius - 1,
                 y_offset
             ),
             current_temp,
-            font=f,
-            fill=color
+            color
         )
 
         d.rectangle(
@@ -92,11 +89,9 @@ class TemperatureView:
         )
 
     def draw_forecast(self):
-        font_path = os.path.join(Config.FONTS, "resolution-3x4.ttf")
         font_size = 4
 
-        f = ImageFont.truetype(font_path, font_size)
-        d = ImageDraw.Draw(self._temperature_image)
+        f = Fonts.get("resolution-3x4", font_size)
 
         data = self._weather_data[self._location]["daily"]
 
@@ -125,19 +120,19 @@ class TemperatureView:
         for i, forecast in enumerate(data):
 
             day = datetime.fromtimestamp(forecast["dt"]).strftime("%A")[0]
-            day_length = int(d.textlength(day, f))
+            day_length = int(f.length(day))
 
             day_x = x + (block_width // 2) - (day_length // 2)
             day_y = y_offset
 
-            d.text(
+            f.draw(
+                self._temperature_image,
                 (
                     day_x,
                     day_y
                 ),
                 day,
-                font=f,
-                fill=neutral_color
+                neutral_color
             )
 
             min_temp_int = int(forecast["temp"]["min"] - 273.15)
@@ -180,33 +175,33 @@ class TemperatureView:
             min_temp = str(min_temp_int)
             max_temp = str(max_temp_int)
 
-            min_temp_length = int(d.textlength(min_temp, f))
-            max_temp_length = int(d.textlength(max_temp, f))
+            min_temp_length = int(f.length(min_temp))
+            max_temp_length = int(f.length(max_temp))
 
             max_x = x + (block_width // 2) - (max_temp_length // 2)
             max_y = y_offset + font_size + 1
 
-            d.text(
+            f.draw(
+                self._temperature_image,
                 (
                     max_x,
                     max_y
                 ),
                 max_temp,
-                font=f,
-                fill=max_color
+                max_color
             )
 
             min_x = x + (block_width // 2) - (min_temp_length // 2)
             min_y = y_offset + ((font_size + 1) * 2)
 
-            d.text(
+            f.draw(
+                self._temperature_image,
                 (
                     min_x,
                     min_y
                 ),
                 min_temp,
-                font=f,
-                fill=min_color
+                min_color
             )
 
             icon_x = x + (block_width // 2) - (icon_size // 2)
@@ -224,9 +219,4 @@ class TemperatureView:
             x += block_width
 
     def get_icon(self, code, size):
-        path = os.path.join(Config.SRC_BASE, "assets", "weather_view", "icons", f"{code}.png")
-        image = Image.open(path)
-
-        resized = image.resize((size, size), Image.BOX)
-
-        return resized
+        return Assets.get("weather_icons", code, size)
@@ -1,11 +1,16 @@
 from PIL import Image, ImageDraw, ImageFont
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 import json
 
 from config import Config
 
-from common import msleep
+from common import FrameClock, msleep
+from fonts import Fonts
+from http_client import shared_client
+from snapshot import SnapshotStore
 from transitions import Transitions
+from views.weather_view.radar_cache import RadarCache
 from views.weather_view.radar_view import RadarView
 from views.weather_view.temperature_view import TemperatureView
 from views.weather_view.wind_view import WindView
@@ -18,15 +23,26 @@ import threading
 request_e_radar = threading.Event()
 request_e_weather = threading.Event()
 
-new_frames = []
-last_updated = 0
-radar_api_updated = False
+request_t_radar = None
+request_t_weather = None
 
-weather_data = {}
-weather_api_updated = False
+# Published by the request threads, read by the view.
+radar_store = SnapshotStore(
+    {
+        "frames": (),
+        "generated": 0,
+        "error": False
+    }
+)
 
-radar_api_error = False
-weather_api_error = False
+# Flagged as an error until every location has had data.
+weather_store = SnapshotStore(
+    {
+        "locations": {},
+        "duration": None,
+        "error": True
+    }
+)
 
 LOCATIONS = [
     {
@@ -66,12 +82,24 @@ class WeatherView:
     FORECAST_INTERVAL = 16000 # ms.
     WIND_INTERVAL = 30000 # ms.
     MOON_INTERVAL = 20000 # ms.
+    NO_DATA_INTERVAL = 5000 # ms.
 
     RADAR_LOOPS = 5
 
+    # Transition effects, by name from the Transitions registry.
+    RADAR_TRANSITION = "vertical"
+    FORECAST_TRANSITION = "vertical"
+    LOCATION_TRANSITION = "horizontal"
+    WIND_TRANSITION = "horizontal"
+    MOON_TRANSITION = "horizontal"
+
     RADAR_API_INTERVAL = 300 # s.
     WEATHER_API_INTERVAL = 900 # s.
 
+    DATA_TIMEOUT = 15  # s to wait for the first API calls.
+
+    ASSET_GROUPS = ["weather_icons", "moon_icons"]  # Warmed when the view is configured.
+
     def __init__(self, matrix, press_event):
         self._matrix = matrix
         self._press_event = press_event
@@ -79,15 +107,21 @@ class WeatherView:
         self._start_time_radar = time.time()
         self._start_time_weather = time.time()
 
-        self._frames = []
+        self._frames = ()
+        self._radar_version = 0
+        self._prefetched = False
 
-        self._request_t_radar = threading.Thread(name="requests_radar", target=request_thread_radar)
-        self._request_t_radar.daemon = True
-        self._request_t_radar.start()
+        # Start the request threads once, even if the view is built again.
+        global request_t_radar, request_t_weather
+        if request_t_radar is None:
+            request_t_radar = threading.Thread(name="requests_radar", target=request_thread_radar)
+            request_t_radar.daemon = True
+            request_t_radar.start()
 
-        self._request_t_weather = threading.Thread(name="requests_weather", target=request_thread_weather)
-        self._request_t_weather.daemon = True
-        self._request_t_weather.start()
+        if request_t_weather is None:
+            request_t_weather = threading.Thread(name="requests_weather", target=request_thread_weather)
+            request_t_weather.daemon = True
+            request_t_weather.start()
 
         self._radar_view = RadarView(self._matrix)
 
@@ -101,35 +135,32 @@ class WeatherView:
         self._moon_view = MoonView(self._matrix)
 
     def run(self):
-        global last_updated
-        global radar_api_updated
-        global radar_api_error
-        global weather_api_error
+        # Data requested by prefetch() is already fresh.
+        if not self._prefetched:
+            self.request_data()
 
-        last_updated = 0
-        request_e_radar.set()
-        request_e_weather.set()
-
-        # Wait for initial frame data to be generated.
-        while(not radar_api_updated and not radar_api_error and len(self._frames) == 0):
-            msleep(200)
+        self._prefetched = False
 
-        self.check_update()
+        self.wait_for_data()
 
         prev_image = None
         while not self._press_event.is_set():
+            shown = False
 
             self.check_update()
-            if not radar_api_error:
+            if not radar_store.get().data["error"] and self._frames:
                 prev_image = self.start_radar_loop(prev_image)
                 if prev_image == -1:
                     return
 
-            # Ensure that weather api data gets set.
-            while len(weather_data) != len(LOCATIONS) and not weather_api_error:
-                msleep(200)
+                shown = True
+
+            # Ensure that weather api data gets set, unless the api is down.
+            weather = weather_store.wait(0, self.DATA_TIMEOUT)
+
+            if not weather.data["error"]:
+                shown = True
 
-            if not weather_api_error:
                 self.check_update()
                 prev_image = self.start_temperature_loop(prev_image)
                 if prev_image == -1:
@@ -145,6 +176,33 @@ class WeatherView:
                 if prev_image == -1:
                     return
 
+            if not shown:
+                prev_image = self.start_no_data_loop()
+                if prev_image == -1:
+                    return
+
+    def prefetch(self):
+        """
+        Fetches the radar and weather data before the view is shown.
+        """
+        self.request_data()
+        self.wait_for_data()
+
+        self._prefetched = True
+
+    def request_data(self):
+        request_e_radar.set()
+        request_e_weather.set()
+
+    def wait_for_data(self):
+        """
+        Waits for the initial radar frames to be generated. The view shows
+        whatever it has if the api doesn't answer in time.
+        """
+        radar_store.wait(0, self.DATA_TIMEOUT)
+
+        self.check_update()
+
     def start_radar_loop(self, prev_image):
         current_image = None
         for _ in range(self.RADAR_LOOPS):
@@ -156,40 +214,36 @@ class WeatherView:
 
                 if prev_image == None:
                     self._matrix.set_image(current_image, unsafe=False)
-                    msleep(self.FRAME_INTERVAL)
+                    hold = self.FRAME_INTERVAL
 
                 else:
-                    Transitions.vertical_transition(self._matrix, prev_image, current_image)
+                    Transitions.run(self._matrix, self.RADAR_TRANSITION, prev_image, current_image)
                     prev_image = None
-                    msleep(self.HOLD_TIME)
+                    hold = self.HOLD_TIME
 
-                if self._press_event.is_set():
+                if self._press_event.wait(hold / 1000):
                     return -1
 
-            msleep(self.HOLD_TIME - self.FRAME_INTERVAL)
+            if self._press_event.wait((self.HOLD_TIME - self.FRAME_INTERVAL) / 1000):
+                return -1
 
         return current_image
 
     def start_temperature_loop(self, prev_image):
         for i, location in enumerate(self._location_temperature_views):
-            next_image = location.generate_temperature_image(weather_data)
+            next_image = location.generate_temperature_image(weather_store.get().data["locations"])
             self.check_api_interval()
             if prev_image != None:
                 if i == 0:
-                    Transitions.vertical_transition(self._matrix, prev_image, next_image)
+                    Transitions.run(self._matrix, self.FORECAST_TRANSITION, prev_image, next_image)
 
                 else:
-                    Transitions.horizontal_transition(self._matrix, prev_image, next_image)
+                    Transitions.run(self._matrix, self.LOCATION_TRANSITION, prev_image, next_image)
             else:
                 self._matrix.set_image(next_image, unsafe=False)
 
-            start_time = time.time()
-
-            while time.time() - start_time <= (self.FORECAST_INTERVAL / 1000):
-                msleep(500)
-
-                if self._press_event.is_set():
-                    return -1
+            if self._press_event.wait(self.FORECAST_INTERVAL / 1000):
+                return -1
 
             prev_image = next_image
 
@@ -200,39 +254,66 @@ class WeatherView:
 
         self.check_api_interval()
 
-        self._wind_view.initialize_particles(weather_data[WIND_LOCATION]["current"]["wind_speed"])
+        locations = weather_store.get().data["locations"]
+        self._wind_view.initialize_particles(locations[WIND_LOCATION]["current"]["wind_speed"])
 
         next_image = self._wind_view.generate_wind_image()
 
-        Transitions.horizontal_transition(self._matrix, prev_image, next_image)
+        Transitions.run(self._matrix, self.WIND_TRANSITION, prev_image, next_image)
+
+        clock = FrameClock(sleep)
 
         start_time = time.time()
         while time.time() - start_time <= (self.WIND_INTERVAL / 1000):
             next_image = self._wind_view.generate_wind_image()
             self._matrix.set_image(next_image)
-            msleep(sleep)
+            clock.tick()
 
             if self._press_event.is_set():
+                clock.log_stats("WindView")
                 return -1
 
+        clock.log_stats("WindView")
+
         return next_image
 
     def start_moon_loop(self, prev_image):
-        self._moon_view.update_moon(weather_data[MOON_LOCATION]["daily"][0]["moon_phase"])
+        locations = weather_store.get().data["locations"]
+        self._moon_view.update_moon(locations[MOON_LOCATION]["daily"][0]["moon_phase"])
 
         next_image = self._moon_view.generate_moon_image()
 
-        Transitions.horizontal_transition(self._matrix, prev_image, next_image)
+        Transitions.run(self._matrix, self.MOON_TRANSITION, prev_image, next_image)
 
-        start_time = time.time()
-        while time.time() - start_time <= (self.MOON_INTERVAL / 1000):
-            msleep(500)
-
-            if self._press_event.is_set():
-                return -1
+        if self._press_event.wait(self.MOON_INTERVAL / 1000):
+            return -1
 
         return next_image
 
+    def start_no_data_loop(self):
+        """
+        Shows that there is no data while both apis are down.
+        """
+        image = Image.new("RGB", self._matrix.dimensions)
+
+        f = Fonts.get("resolution-3x4", 4)
+        text = "NO DATA"
+
+        x = (self._matrix.dimensions[0] - int(f.length(text))) // 2
+        y = (self._matrix.dimensions[1] - 5) // 2
+
+        f.draw(image, (x, y), text, "darkred")
+
+        self._matrix.set_image(image, unsafe=False)
+        self.check_api_interval()
+
+        if self._press_event.wait(self.NO_DATA_INTERVAL / 1000):
+            return -1
+
+        self.check_update()
+
+        return image
+
     def check_api_interval(self):
         current_time = time.time()
         if current_time - self._start_time_radar >= self.RADAR_API_INTERVAL:
@@ -244,20 +325,15 @@ class WeatherView:
             request_e_weather.set()
 
     def check_update(self):
-        global radar_api_updated
-        if radar_api_updated:
-            self.update_frames()
-
-    def update_frames(self):
-        global radar_api_updated
-        global new_frames
-
-        self._frames = new_frames.copy()
-        radar_api_updated = False
+        """
+        Switches to the latest radar frames if new ones were published.
+        """
+        snapshot = radar_store.get()
+        if snapshot.version != self._radar_version:
+            self._radar_version = snapshot.version
+            self._frames = snapshot.data["frames"]
 
 def request_thread_radar():
-    global radar_api_error
-
     radar_data = RadarData()
 
     while True:
@@ -265,57 +341,104 @@ def request_thread_radar():
         radar_data_result = radar_data.update()
 
         if radar_data_result == False:
-            radar_api_error = True
-        else:
-            radar_api_error = False
+            radar_store.update(error=True)
+        elif radar_store.get().data["error"]:
+            radar_store.update(error=False)
 
         request_e_radar.clear()
 
 def request_thread_weather():
-    global weather_api_error
-
     weather_data = WeatherData()
 
     while True:
         request_e_weather.wait()
-        weather_data_result = weather_data.update()
-
-        if weather_data_result == False:
-            weather_api_error = True
-        else:
-            weather_api_error = False
+        weather_data.update()
 
         request_e_weather.clear()
 
 class WeatherData:
+    API_URL = "https://api.openweathermap.org/data/3.0/onecall"
     EXCLUDE = "minutely,hourly,alerts"
 
-    RETRY_TIME = 2000
+    TIMEOUT = (3.05, 10)  # s to connect and to read, per request.
+    RETRY_TIME = 2000  # ms before the first retry, doubled after every attempt.
+
+    def __init__(self, client=shared_client):
+        self._client = client
+
+        self._executor = ThreadPoolExecutor(max_workers=len(LOCATIONS), thread_name_prefix="weather")
 
     def update(self, retry_attempts=3):
-        global weather_data
+        """
+        Fetches every location at once and publishes the ones that succeeded
+        merged into the last data. Returns True if every location was updated.
+        """
+        locations = dict(weather_store.get().data["locations"])
+
+        try:
+            api_key = Config.ENV_VALUES['OPENWEATHER_API_KEY']
+        except KeyError:
+            self.log("No API key set.")
+            self.publish(locations, None)
+            return False
 
-        for location in LOCATIONS:
-            api_key = None
-            try:
-                api_key = Config.ENV_VALUES['OPENWEATHER_API_KEY']
-            except KeyError:
-                return False
-            url = f"https://api.openweathermap.org/data/3.0/onecall?lat={location['lat']}&lon={location['lon']}&exclude={self.EXCLUDE}&appid={api_key}"
+        start_time = time.monotonic()
+
+        results = list(
+            self._executor.map(lambda location: self.get_location(location, api_key, retry_attempts), LOCATIONS)
+        )
 
-            for i in range(retry_attempts):
-                try:
-                    data = requests.get(url).json()
-                    break
-                except (requests.exceptions.RequestException, json.decoder.JSONDecodeError):
-                    if i + 1 == retry_attempts:
-                        return False
+        duration = time.monotonic() - start_time
 
-                    msleep(self.RETRY_TIME)
+        failed = []
+        for location, data in zip(LOCATIONS, results):
+            if data is None:
+                failed.append(location["name"])
+            else:
+                locations[location["name"]] = data
+
+        self.log(
+            f"Updated {len(LOCATIONS) - len(failed)}/{len(LOCATIONS)} locations in {round(duration * 1000)} ms."
+            + (f" Failed: {', '.join(failed)}." if failed else "")
+        )
+
+        self.publish(locations, duration)
+
+        return not failed
+
+    def publish(self, locations, duration):
+        """
+        Locations that failed keep their last data. The view can only show
+        the forecast once every location has some, so the snapshot is only
+        flagged as an error while a location has never had data.
+        """
+        weather_store.publish(
+            {
+                "locations": locations,
+                "duration": duration,
+                "error": any(location["name"] not in locations for location in LOCATIONS)
+            }
+        )
+
+    def get_location(self, location, api_key, retry_attempts=3):
+        """
+        Fetches one location, retrying with backoff. Returns None if it failed.
+        """
+        url = f"{self.API_URL}?lat={location['lat']}&lon={location['lon']}&exclude={self.EXCLUDE}&appid={api_key}"
+
+        for i in range(retry_attempts):
+            try:
+                response = self._client.get(url, timeout=self.TIMEOUT)
+                response.raise_for_status()
+                return response.json()
+            except (requests.exceptions.RequestException, json.decoder.JSONDecodeError):
+                if i + 1 == retry_attempts:
+                    return None
 
-            weather_data[location["name"]] = data
+                msleep(self.RETRY_TIME * 2 ** i)
 
-        weather_api_updated = True
+    def log(self, text):
+        print(f"Weather Data - {text}")
 
 class RadarData:
     API_FILE_URL = "https://api.rainviewer.com/public/weather-maps.json"
@@ -333,108 +456,194 @@ class RadarData:
     SMOOTH = 0
     SNOW = 1
 
-    def __init__(self):
+    FETCH_WORKERS = 4  # Frames fetched and converted at once.
+
+    # RainViewer serves the same area at either size, the 512 px tiles just
+    # have more pixels. The smallest size that scales evenly to FRAME_SIZE is used.
+    TILE_SIZES = (256, 512)
+    FRAME_SIZE = 64  # px the whole tile is scaled to.
+    CROP = (0, 15, 64, 47)  # Part of the scaled tile that is shown.
+
+    def __init__(self, client=shared_client, cache=None):
+        self._client = client
+        self._cache = cache or RadarCache()
         self._api_file = None
 
-    def update(self):
-        global radar_api_updated
-        global last_updated
-        global new_frames
+        self.tile_size = self.get_tile_size()
+
+        self._stats = None
+        self._stats_lock = threading.Lock()
+
+        self._executor = ThreadPoolExecutor(max_workers=self.FETCH_WORKERS, thread_name_prefix="radar")
+
+        self.load_cached()
 
+    def load_cached(self):
+        """
+        Shows the frames from the last run straight away, while the API is checked.
+        """
+        frames = self._cache.load_index()
+        if not frames:
+            return
+
+        radar_store.update(frames=tuple(frames))
+
+        self.log(f"Loaded {len(frames)} frames from the cache.")
+
+    def update(self):
         if self.get_api_file() == False:
             return False
 
         # Check if the API data changed.
-        if self._api_file["generated"] == last_updated:
+        if self._api_file["generated"] == radar_store.get().data["generated"]:
             return
 
-        last_updated = self._api_file["generated"]
-
-        new_frames.clear()
-        if self.get_past_radar() == False:
+        frames = self.get_frames()
+        if frames == False:
             return False
 
-        if self.get_nowcast_radar() == False:
-            return False
+        # Publish the complete set at once, so the view never sees part of it.
+        radar_store.publish(
+            {
+                "frames": tuple(frames),
+                "generated": self._api_file["generated"],
+                "error": False
+            }
+        )
 
-        radar_api_updated = True
+        self._cache.save_index(frames)
 
     def get_api_file(self, retry_attempts=3):
         for i in range(retry_attempts):
             try:
-                self._api_file = requests.get(self.API_FILE_URL).json()
+                self._api_file = self._client.get(self.API_FILE_URL, revalidate=True).json()
                 break
             except (requests.exceptions.RequestException, json.decoder.JSONDecodeError):
                 if i + 1 == retry_attempts:
                     return False
                 msleep(self.RETRY_TIME)
 
-    def get_past_radar(self, retry_attempts=3):
-        global new_frames
+    def get_frames(self):
+        """
+        Fetches and converts the past and nowcast frames in parallel.
+        Returns the frames in order, or False if any of them failed.
+        """
+        past = self._api_file["radar"]["past"]
+        nowcast = self._api_file["radar"]["nowcast"]
 
-        size = 512
+        api_data = past[len(past) - self.NUMBER_PAST:] + nowcast[len(nowcast) - self.NUMBER_NOWCAST:]
 
-        number_data = len(self._api_file["radar"]["past"])
+        self._stats = {
+            "downloaded": 0,
+            "bytes": 0,
+            "decode": 0,
+        }
 
-        past_api_data = self._api_file["radar"]["past"][number_data - self.NUMBER_PAST:]
+        start_time = time.monotonic()
+        frames = list(self._executor.map(self.get_frame, api_data))
 
-        for data in past_api_data:
-            url = f"{self._api_file['host']}{data['path']}/{size}/{self.ZOOM}/{self.LATITUDE}/{self.LONGITUDE}/{self.COLOR}/{self.SMOOTH}_{self.SNOW}.png"
+        if False in frames:
+            return False
 
-            radar_image = None
-            for i in range(retry_attempts):
-                try:
-                    radar_image = requests.get(url)
-                    break
-                except requests.exceptions.RequestException:
-                    if i + 1 == retry_attempts:
-                        return False
-                    msleep(self.RETRY_TIME)
+        self._stats["time"] = time.monotonic() - start_time
 
-            img = Image.open(BytesIO(radar_image.content))
-            converted_image = self.convert_image(img)
+        self.log(
+            f"Updated {len(frames)} frames in {round(self._stats['time'] * 1000)} ms. "
+            f"Downloaded {self._stats['downloaded']} {self.tile_size} px tiles, "
+            f"{round(self._stats['bytes'] / 1024, 1)} KB, "
+            f"decoded in {round(self._stats['decode'] * 1000)} ms."
+        )
 
-            new_frames.append(
-                {
-                    "time": data["time"],
-                    "frame": converted_image
-                }
-            )
+        return frames
 
-    def get_nowcast_radar(self, retry_attempts=3):
-        global new_frames
+    def get_frame(self, data, retry_attempts=3):
+        """
+        Downloads and converts a single frame, unless it is already cached.
+        """
+        size = self.tile_size
 
-        size = 512
+        key = self._cache.get_key(data["path"], size, self.ZOOM, self.LATITUDE, self.LONGITUDE, self.COLOR, self.SMOOTH, self.SNOW)
 
-        number_data = len(self._api_file["radar"]["nowcast"])
+        cached_image = self._cache.get(key)
+        if cached_image is not None:
+            return {
+                "time": data["time"],
+                "key": key,
+                "frame": cached_image
+            }
 
-        nowcast_api_data = self._api_file["radar"]["nowcast"][number_data - self.NUMBER_NOWCAST:]
+        url = f"{self._api_file['host']}{data['path']}/{size}/{self.ZOOM}/{self.LATITUDE}/{self.LONGITUDE}/{self.COLOR}/{self.SMOOTH}_{self.SNOW}.png"
 
-        for data in nowcast_api_data:
-            url = f"{self._api_file['host']}{data['path']}/{size}/{self.ZOOM}/{self.LATITUDE}/{self.LONGITUDE}/{self.COLOR}/{self.SMOOTH}_{self.SNOW}.png"
+        start_time = time.monotonic()
 
-            radar_image = None
-            for i in range(retry_attempts):
-                try:
-                    radar_image = requests.get(url)
-                    break
-                except requests.exceptions.RequestException:
-                    if i == retry_attempts:
-                        return False
-                    msleep(self.RETRY_TIME)
+        radar_image = None
+        for i in range(retry_attempts):
+            try:
+                # Tiles never change, so they aren't revalidated. They share
+                # one endpoint since every path has its own timestamp.
+                radar_image = self._client.get(url, endpoint="rainviewer-tile")
+                radar_image.raise_for_status()
+                break
+            except requests.exceptions.RequestException:
+                if i + 1 == retry_attempts:
+                    return False
+                msleep(self.RETRY_TIME)
+
+        fetch_time = time.monotonic()
 
+        try:
             img = Image.open(BytesIO(radar_image.content))
             converted_image = self.convert_image(img)
+        except OSError:
+            return False
 
-            new_frames.append(
-                {
-                    "time": data["time"],
-                    "frame": converted_image
-                }
-            )
+        decode_time = time.monotonic()
+
+        with self._stats_lock:
+            self._stats["downloaded"] += 1
+            self._stats["bytes"] += len(radar_image.content)
+            self._stats["decode"] += decode_time - fetch_time
+
+        self._cache.put(key, converted_image)
+
+        self.log(
+            f"Frame {data['time']}: fetched in {round((fetch_time - start_time) * 1000)} ms, "
+            f"converted in {round((decode_time - fetch_time) * 1000)} ms."
+        )
+
+        return {
+            "time": data["time"],
+            "key": key,
+            "frame": converted_image
+        }
+
+    def get_tile_size(self):
+        for size in self.TILE_SIZES:
+            if size >= self.FRAME_SIZE and size % self.FRAME_SIZE == 0:
+                return size
+
+        return self.TILE_SIZES[-1]
+
+    def get_stats(self):
+        """
+        Returns the bytes downloaded and time spent decoding in the last refresh.
+        """
+        return self._stats
 
     def convert_image(self, image):
-        image = image.convert("RGB")
-        resized = image.resize((64, 64), Image.BOX)
-        cropped = resized.crop((0, 15, 64, 47))
+        """
+        Crops the tile to the part that is shown, then averages each block of
+        pixels down to one. Only the shown rows are decoded to RGB and reduced.
+        """
+        factor = image.width // self.FRAME_SIZE
+
+        cropped = image.crop(tuple(edge * factor for edge in self.CROP))
+        cropped = cropped.convert("RGB")
+
+        if factor > 1:
+            return cropped.reduce(factor)
+
         return cropped
+
+    def log(self, text):
+        print(f"Radar Data - {text}")
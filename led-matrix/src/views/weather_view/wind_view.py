@@ -1,10 +1,9 @@
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 import random
 import math
-import os
 import time
 
-from config import Config
+from fonts import Fonts
 
 class WindView:
     BG_COLOR = "black"
@@ -109,17 +108,16 @@ class WindView:
             )
 
     def draw_time(self, image):
-        font_path = os.path.join(Config.FONTS, "cg-pixel-4x5.ttf")
         font_size = 5
 
-        f = ImageFont.truetype(font_path, font_size)
+        f = Fonts.get("cg-pixel-4x5", font_size)
         d = ImageDraw.Draw(image)
 
         y_offset = 1
 
         time_str = time.strftime("%I:%M %p")
         time_str = time_str.lstrip("0")
-        time_length = int(d.textlength(time_str, f))
+        time_length = int(f.length(time_str))
 
         x = (self._matrix.dimensions[0] // 2) - (time_length // 2)
 
@@ -133,27 +131,26 @@ class WindView:
             fill = self.BG_COLOR
         )
 
-        d.text(
+        f.draw(
+            image,
             (
                 x,
                 y_offset
             ),
             time_str,
-            font=f,
-            fill=(170, 170, 170)
+            (170, 170, 170)
         )
 
     def draw_windspeed(self, image):
-        font_path = os.path.join(Config.FONTS, "resolution-3x4.ttf")
         font_size = 4
 
-        f = ImageFont.truetype(font_path, font_size)
+        f = Fonts.get("resolution-3x4", font_size)
         d = ImageDraw.Draw(image)
 
         y_offset = 1
 
         speed_str = f"{round(self._display_windspeed, 1)} km/h"
-        speed_length = int(d.textlength(speed_str, f))
+        speed_length = int(f.length(speed_str))
 
         x = (self._matrix.dimensions[0] // 2) - (speed_length // 2)
 
@@ -168,14 +165,14 @@ class WindView:
             fill = self.BG_COLOR
         )
 
-        d.text(
+        f.draw(
+            image,
             (
                 x,
                 self._matrix.dimensions[1] - (font_size + 1) - y_offset,
             ),
             speed_str,
-            font=f,
-            fill=(170, 170, 170)
+            (170, 170, 170)
         )
 
 class Particle:
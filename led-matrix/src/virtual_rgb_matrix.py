@@ -1,21 +1,94 @@
 import tkinter as tk
 import PIL
-from PIL import ImageTk, ImageDraw
+from PIL import Image, ImageTk, ImageDraw
+import _thread
 import sys
+import threading
 import time
 
 class RGBMatrix:
+    REFRESH_RATE = 120  # Simulated panel refresh rate in Hz.
+
     def __init__(self, options):
         self.width = options.cols
         self.height = options.rows
 
-        self._window = MatrixWindow()
+        # Created on first draw, since Tk must only be used from the thread that created it.
+        self._window = None
+
+        self._front = FrameCanvas(self.width, self.height)
+        self._vsync_start = time.monotonic()
+
+        self._swaps = 0
+        self._vsync_wait = 0
+        self._vsync_wait_max = 0
 
     def SetImage(self, image, unsafe=True):
+        self._front.SetImage(image, unsafe=unsafe)
+        self.get_window().update_image(self._front.image)
+
+    def Clear(self):
+        self._front.Clear()
+        self.get_window().update_image(self._front.image)
+
+    def CreateFrameCanvas(self):
+        return FrameCanvas(self.width, self.height)
+
+    def SwapOnVSync(self, canvas, framerate_fraction=1):
+        """
+        Waits for the next simulated vertical sync and shows the canvas.
+        Returns the canvas that was shown before, to draw the next frame into.
+        """
+        interval = framerate_fraction / self.REFRESH_RATE
+
+        now = time.monotonic()
+        elapsed = now - self._vsync_start
+        wait = interval - (elapsed % interval)
+        time.sleep(wait)
+
+        self._swaps += 1
+        self._vsync_wait += wait
+        self._vsync_wait_max = max(self._vsync_wait_max, wait)
+
+        self.get_window().update_image(canvas.image)
+
+        previous = self._front
+        self._front = canvas
+
+        return previous
+
+    def get_window(self):
+        if self._window is None:
+            self._window = MatrixWindow()
+
+        return self._window
+
+    def get_swap_stats(self):
+        """
+        Returns the number of swaps and the time spent waiting for vertical sync.
+        """
+        return {
+            "swaps": self._swaps,
+            "vsync_wait_ms": round(self._vsync_wait * 1000, 2),
+            "vsync_wait_avg_ms": round(self._vsync_wait * 1000 / self._swaps, 3) if self._swaps else 0,
+            "vsync_wait_max_ms": round(self._vsync_wait_max * 1000, 3),
+        }
+
+class FrameCanvas:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+        self.image = Image.new("RGB", (width, height))
+
+    def SetImage(self, image, offset_x=0, offset_y=0, unsafe=True):
         if (image.mode != "RGB"):
             raise Exception("Currently, only RGB mode is supported for SetImage(). Please create images with mode 'RGB' or convert first with image = image.convert('RGB'). Pull requests to support more modes natively are also welcome :)")
 
-        self._window.update_image(image)
+        self.image.paste(image, (offset_x, offset_y))
+
+    def Clear(self):
+        self.image.paste((0, 0, 0), (0, 0, self.width, self.height))
 
 class RGBMatrixOptions:
     def __init__(self):
@@ -94,6 +167,10 @@ class MatrixWindow:
 
             self._frames += 1
         except tk.TclError:
+            # Stop the whole program when the window is closed from the render thread.
+            if threading.current_thread() is not threading.main_thread():
+                _thread.interrupt_main()
+
             sys.exit(0)
 
     def get_fps(self):
@@ -10,21 +10,56 @@ logging.basicConfig(level=logging.INFO)
 
 ATTEMPTS = 3
 
+# Signals handled by led-matrix to blank the panel and pause, and to resume.
+STANDBY_SIGNAL = "SIGUSR1"
+RESUME_SIGNAL = "SIGUSR2"
+
 client = docker.from_env()
 
+def send_signal(container, signal):
+    """
+    Sends a signal to the container. Returns False if it couldn't be delivered.
+    """
+    for attempt in range(ATTEMPTS):
+        try:
+            container.kill(signal=signal)
+            return True
+        except docker.errors.APIError as e:
+            logger.warning(f"Failed to send {signal} to led-matrix ({attempt + 1}/{ATTEMPTS}): {e}")
+            time.sleep(1)
+
+    return False
+
 def motion_function():
-    logger.info("Motion detected. Starting led-matrix...")
+    logger.info("Motion detected. Resuming led-matrix...")
 
     container = client.containers.get("led-matrix")
-    container.start()
+
+    if container.status == "running" and send_signal(container, RESUME_SIGNAL):
+        logger.info("led-matrix resumed")
+        return
+
+    # Fall back to a full restart.
+    logger.info("Starting led-matrix...")
+    container.restart()
 
     logger.info("led-matrix started")
 
 
 def no_motion_function():
-    logger.info("Motion stopped. Stopping led-matrix...")
+    logger.info("Motion stopped. Putting led-matrix in standby...")
 
     container = client.containers.get("led-matrix")
+
+    if container.status != "running":
+        return
+
+    if send_signal(container, STANDBY_SIGNAL):
+        logger.info("led-matrix in standby")
+        return
+
+    # Fall back to stopping the container.
+    logger.info("Stopping led-matrix...")
     container.stop()
 
     logger.info("led-matrix stopped")
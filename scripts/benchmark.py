@@ -0,0 +1,292 @@
+from PIL import Image
+import numpy as np
+import argparse
+import multiprocessing
+import os
+import queue
+import resource
+import sys
+import threading
+import time
+
+# Allow importing the led-matrix modules.
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "led-matrix", "src")
+sys.path.insert(0, SRC_PATH)
+
+DIMENSIONS = (64, 32)
+
+def get_virtual_matrix():
+    """Creates the virtual matrix directly so its argument parser is skipped.
+    """
+    from virtual_rgb_matrix import RGBMatrix, RGBMatrixOptions
+
+    options = RGBMatrixOptions()
+    options.cols = DIMENSIONS[0]
+    options.rows = DIMENSIONS[1]
+
+    return RGBMatrix(options=options)
+
+class NullMatrix:
+    """Headless matrix that counts frames and stops the view after a limit.
+    """
+    def __init__(self, press_event, frame_limit):
+        self.dimensions = DIMENSIONS
+        self.current_image = None
+        self.frames = 0
+
+        self._press_event = press_event
+        self._frame_limit = frame_limit
+
+    def set_image(self, image, unsafe=True):
+        self.current_image = image
+        self.frames += 1
+
+        if self.frames >= self._frame_limit:
+            self._press_event.set()
+
+def peak_rss(target, *args, timeout=600):
+    """Runs the target in a fresh process and returns its peak RSS in MB.
+    Raises RuntimeError if the target fails, times out or the process dies.
+    """
+    def child(result, *args):
+        error = None
+        try:
+            if target is not None:
+                target(*args)
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            result.put((error, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+    context = multiprocessing.get_context("fork")
+    result = context.Queue()
+
+    process = context.Process(target=child, args=(result, *args))
+    process.start()
+
+    # Stop waiting as soon as the child dies without a result.
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            error, peak = result.get(timeout=1)
+            break
+        except queue.Empty:
+            if process.is_alive() and time.monotonic() < deadline:
+                continue
+
+        try:
+            error, peak = result.get_nowait()
+            break
+        except queue.Empty:
+            process.kill()
+            process.join()
+            raise RuntimeError(f"no result (exit code {process.exitcode})")
+
+    process.join()
+
+    if error is not None:
+        raise RuntimeError(error)
+
+    if process.exitcode != 0:
+        raise RuntimeError(f"exit code {process.exitcode}")
+
+    return peak
+
+def report(name, frames, elapsed):
+    print(f"{name:<32} {frames / elapsed:>10.1f} fps  {elapsed / frames * 1000:>8.3f} ms/frame")
+
+def bench_earth(args):
+    """Compares the per-node Earth renderer with the vectorized and precomputed ones.
+    """
+    from views.iss_view.iss_view import Earth
+
+    class LoopEarth(Earth):
+        """The original per-node renderer, kept for comparison.
+        """
+        def rotate(self, matrix):
+            center = self.find_center()
+
+            for i, node in enumerate(self._earth_nodes):
+                self._earth_nodes[i] = center + np.matmul(matrix, node - center)
+
+            self._iss_nodes[0] = center + np.matmul(matrix, self._iss_nodes[0] - center)
+            self._home_nodes[0] = center + np.matmul(matrix, self._home_nodes[0] - center)
+
+        def draw(self, image):
+            for i, node in enumerate(self._earth_nodes):
+                if self._draw_mask[i] and node[2] > 1:
+                    image.putpixel(
+                        (self.X + int(node[0]), self.Y + int(node[1]) * -1), self.EARTH_COLOR
+                    )
+
+            for node, color in ((self._iss_nodes[0], self.ISS_COLOR), (self._home_nodes[0], self.HOME_COLOR)):
+                if node[2] > 1:
+                    image.putpixel((self.X + int(node[0]), self.Y + int(node[1]) * -1), color)
+
+    matrix = get_virtual_matrix() if args.virtual else None
+
+    def run_loop(earth):
+        earth.update_iss()
+
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            image = Image.new("RGB", DIMENSIONS, color="black")
+            earth.draw(image)
+            earth.update_spin()
+
+            if matrix is not None:
+                matrix.SetImage(image)
+
+        return time.perf_counter() - start
+
+    def run_vectorized(earth):
+        earth.update_iss()
+
+        background = np.zeros((DIMENSIONS[1], DIMENSIONS[0], 3), dtype=np.uint8)
+
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            frame = background.copy()
+            earth.draw(frame)
+            earth.update_spin()
+            image = Image.fromarray(frame, "RGB")
+
+            if matrix is not None:
+                matrix.SetImage(image)
+
+        return time.perf_counter() - start
+
+    report("Earth (per-node loop)", args.frames, run_loop(LoopEarth()))
+    report("Earth (vectorized)", args.frames, run_vectorized(Earth()))
+    report("Earth (precomputed)", args.frames, run_vectorized(Earth(precompute=True)))
+
+def play_video(video, stream, frames, unpaced):
+    from views.video_view.video_view import VideoView
+
+    press_event = threading.Event()
+    matrix = NullMatrix(press_event, frames)
+
+    view = VideoView(matrix, press_event, video, stream=stream)
+
+    # Play as fast as possible rather than at the clip's frame rate.
+    if unpaced:
+        view._sleep = 0
+
+    view.run()
+
+def bench_video(args):
+    """Reports the peak RSS of eager and streaming video playback.
+    """
+    baseline = peak_rss(None)
+    print(f"{'Baseline':<32} {baseline:>8.1f} MB")
+
+    for video in args.videos:
+        for name, stream in (("eager", False), ("streaming", True)):
+            try:
+                peak = peak_rss(play_video, video, stream, args.frames, args.unpaced)
+            except RuntimeError as e:
+                print(f"{video + ' (' + name + ')':<32} failed: {e}")
+                continue
+
+            print(f"{video + ' (' + name + ')':<32} {peak:>8.1f} MB  (+{peak - baseline:.1f} MB)")
+
+def bench_transitions(args):
+    """Reports the per-step cost of every registered transition effect.
+    """
+    from transitions import Transitions
+
+    rng = np.random.default_rng(0)
+    prev = rng.integers(0, 256, (DIMENSIONS[1], DIMENSIONS[0], 3), dtype=np.uint8)
+    new = rng.integers(0, 256, (DIMENSIONS[1], DIMENSIONS[0], 3), dtype=np.uint8)
+
+    matrix = get_virtual_matrix() if args.virtual else None
+    budget = 1000 / Transitions.FPS
+
+    print(f"Frame budget at {Transitions.FPS} fps: {budget:.1f} ms")
+
+    for name, entry in Transitions.EFFECTS.items():
+        kernel = entry["effect"](prev, new)
+
+        start = time.perf_counter()
+        for i in range(args.frames):
+            image = Transitions.to_image(kernel((i + 1) / args.frames))
+
+            if matrix is not None:
+                matrix.SetImage(image)
+
+        report(f"Transition ({name})", args.frames, time.perf_counter() - start)
+
+def bench_radar(args):
+    """Reports the bytes downloaded and decode time of a radar refresh with the
+    old 512 px tiles and with the tile size RadarData picks now.
+    """
+    import tempfile
+
+    from http_client import HttpClient
+    from views.weather_view.radar_cache import RadarCache
+    from views.weather_view.weather_view import RadarData
+
+    class LegacyRadarData(RadarData):
+        def get_tile_size(self):
+            return 512
+
+        def convert_image(self, image):
+            image = image.convert("RGB")
+            resized = image.resize((64, 64), Image.BOX)
+            return resized.crop((0, 15, 64, 47))
+
+    for name, radar_class in (("512 px, resize", LegacyRadarData), ("current", RadarData)):
+        # Empty cache so every frame is downloaded.
+        with tempfile.TemporaryDirectory() as cache_path:
+            radar = radar_class(HttpClient(), RadarCache(cache_path))
+            if args.api_url:
+                radar.API_FILE_URL = args.api_url
+
+            if radar.get_api_file() == False or radar.get_frames() == False:
+                print(f"{name}: refresh failed")
+                continue
+
+            stats = radar.get_stats()
+            print(
+                f"{name + ' (' + str(radar.tile_size) + ' px)':<32} "
+                f"{stats['bytes'] / 1024:>8.1f} KB  {stats['decode'] * 1000:>8.1f} ms decode  "
+                f"{stats['time'] * 1000:>8.1f} ms total"
+            )
+
+def main():
+    """Entry point.
+    """
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-n", "--frames", type=int,
+                        help="number of frames to render. default 500", default=500)
+    common.add_argument("-v", "--virtual", action="store_true",
+                        help="push every frame to the virtual matrix window")
+
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the led-matrix renderers.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    subparsers.add_parser("earth", parents=[common],
+                          help="ISS view Earth renderer").set_defaults(func=bench_earth)
+
+    subparsers.add_parser("transitions", parents=[common],
+                          help="per-step cost of the transition effects").set_defaults(func=bench_transitions)
+
+    video_parser = subparsers.add_parser("video", parents=[common],
+                                         help="peak RSS of video playback")
+    video_parser.add_argument("videos", nargs="*", default=["fireplace", "obi"],
+                              help="videos to play. default fireplace obi")
+    video_parser.add_argument("--unpaced", action="store_true",
+                              help="play as fast as possible instead of at each clip's frame rate")
+    video_parser.set_defaults(func=bench_video)
+
+    radar_parser = subparsers.add_parser("radar",
+                                         help="bytes and decode time of a radar refresh")
+    radar_parser.add_argument("--api-url",
+                              help="weather-maps.json to use instead of RainViewer's")
+    radar_parser.set_defaults(func=bench_radar)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
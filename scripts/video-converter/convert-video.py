@@ -1,22 +1,402 @@
 from PIL import Image
 import cv2
 import numpy as np
-import os, shutil
+import os
 import argparse
+import collections
+import concurrent.futures
+import glob
+import io
 import json
+import sys
 import tarfile
+import tempfile
+import threading
+import time
+
+# Allow importing the raw video format from led-matrix.
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "led-matrix", "src")
+sys.path.insert(0, SRC_PATH)
+
+from views.video_view.raw_video import RawVideo, RawVideoWriter, EXTENSION, COMPRESSION_NONE, COMPRESSION_RLE, COMPRESSION_INDEXED
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".avi", ".webm", ".gif")
+
+PALETTE_SAMPLES = 200000  # Pixels sampled from the clip to build the palette.
+
+# 4x4 Bayer thresholds, centered on 0.
+BAYER_4X4 = (np.array([
+    [0, 8, 2, 10],
+    [12, 4, 14, 6],
+    [3, 11, 1, 9],
+    [15, 7, 13, 5],
+], dtype=np.float32) + 0.5) / 16 - 0.5
+
+# Offsets of the Bayer pattern for temporal dithering. Cycling through them
+# gives each pixel a different threshold every frame.
+TEMPORAL_SHIFTS = [(0, 0), (2, 2), (0, 2), (2, 0)]
+
+print_lock = threading.Lock()
 
 def pixelate(img, w, h):
     return cv2.resize(img, (w, h), interpolation=cv2.INTER_LINEAR)
 
+def process_frame(frame, w, h, output_format):
+    """Resizes and encodes a single frame. Runs in the worker processes.
+    """
+    resized = pixelate(frame, w, h)
+
+    if output_format == "raw":
+        return cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
+
+    ret, png = cv2.imencode(".png", resized)
+    return png.tobytes()
+
+def resize_frame(frame, w, h):
+    """Resizes a single frame to RGB. Runs in the worker processes.
+    """
+    return cv2.cvtColor(pixelate(frame, w, h), cv2.COLOR_BGR2RGB)
+
+def quantize_frame(rgb, palette, palette_lab, spread, shift, output_format):
+    """Dithers a resized frame, maps it onto the palette and encodes the indices.
+    Runs in the worker processes.
+    """
+    h, w = rgb.shape[:2]
+    pixels = rgb.astype(np.float32)
+
+    if spread > 0:
+        bayer = np.roll(BAYER_4X4, shift, axis=(0, 1))
+        threshold = np.tile(bayer, (h // 4 + 1, w // 4 + 1))[:h, :w]
+        pixels += threshold[..., None] * spread
+
+    lab = to_lab(np.clip(pixels, 0, 255)).reshape(-1, 1, 3)
+    distances = ((lab - palette_lab.reshape(1, -1, 3)) ** 2).sum(axis=2)
+    indices = distances.argmin(axis=1).astype(np.uint8).reshape(h, w)
+
+    if output_format == "raw":
+        return indices
+
+    image = Image.fromarray(indices, "P")
+    image.putpalette(palette.flatten().tolist())
+
+    png = io.BytesIO()
+    image.save(png, "PNG")
+    return png.getvalue()
+
+def to_lab(rgb):
+    """Converts RGB values to CIELAB, where distances follow perceived colour.
+    """
+    return cv2.cvtColor(np.asarray(rgb, dtype=np.float32) / 255, cv2.COLOR_RGB2Lab)
+
+def from_lab(lab):
+    rgb = cv2.cvtColor(np.asarray(lab, dtype=np.float32), cv2.COLOR_Lab2RGB)
+    return np.clip(np.round(rgb * 255), 0, 255).astype(np.uint8)
+
+def snap_to_pwm(palette, pwm_bits):
+    """Rounds the palette to the levels the panel can show at the given PWM depth.
+    """
+    if pwm_bits >= 8:
+        return palette
+
+    step = 255 / ((1 << pwm_bits) - 1)
+    return np.clip(np.round(np.round(palette / step) * step), 0, 255).astype(np.uint8)
+
+def build_palette(frames, colors, method, pwm_bits):
+    """Picks a palette for the whole clip from a sample of its pixels.
+    """
+    pixels = np.concatenate([frame.reshape(-1, 3) for frame in frames])
+
+    if len(pixels) > PALETTE_SAMPLES:
+        rng = np.random.default_rng(0)
+        pixels = pixels[rng.choice(len(pixels), PALETTE_SAMPLES, replace=False)]
+
+    colors = min(colors, len(np.unique(pixels, axis=0)))
+
+    if method == "kmeans":
+        lab = to_lab(pixels.reshape(-1, 1, 3)).reshape(-1, 3)
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 0.5)
+
+        cv2.setRNGSeed(0)
+        _, _, centers = cv2.kmeans(lab, colors, None, criteria, 1, cv2.KMEANS_PP_CENTERS)
+        palette = from_lab(centers.reshape(-1, 1, 3)).reshape(-1, 3)
+    else:
+        quantized = Image.fromarray(pixels.reshape(-1, 1, 3)).quantize(colors, method=Image.Quantize.MEDIANCUT)
+        used = np.unique(np.asarray(quantized))
+        palette = np.array(quantized.getpalette(), dtype=np.uint8).reshape(-1, 3)[used]
+
+    return np.unique(snap_to_pwm(palette, pwm_bits), axis=0)
+
+def dither_spread(palette, pwm_bits):
+    """Returns the dither amplitude: the typical gap between neighbouring palette
+    colours, and at least one PWM step.
+    """
+    spread = 0
+    if len(palette) > 1:
+        colors = palette.astype(np.float32)
+        distances = np.sqrt(((colors[:, None] - colors[None]) ** 2).sum(axis=2))
+        np.fill_diagonal(distances, np.inf)
+        spread = float(np.median(distances.min(axis=1)))
+
+    if pwm_bits < 8:
+        spread = max(spread, 255 / ((1 << pwm_bits) - 1))
+
+    return spread
+
+def map_ordered(pool, fn, items, max_in_flight):
+    """Runs fn over the items in the pool and yields the results in order,
+    with a bounded number in flight.
+    """
+    in_flight = collections.deque()
+
+    for item in items:
+        in_flight.append(pool.submit(fn, *item))
+
+        if len(in_flight) >= max_in_flight:
+            yield in_flight.popleft().result()
+
+    while in_flight:
+        yield in_flight.popleft().result()
+
+def log(text, end="\n"):
+    with print_lock:
+        print(text, end=end, flush=True)
+
+def find_inputs(input_path):
+    """Expands a file, directory or glob into a list of video files.
+    """
+    if os.path.isdir(input_path):
+        paths = [
+            os.path.join(input_path, name) for name in os.listdir(input_path)
+            if name.lower().endswith(VIDEO_EXTENSIONS)
+        ]
+    elif os.path.isfile(input_path):
+        paths = [input_path]
+    else:
+        paths = glob.glob(input_path)
+
+    return sorted(p for p in paths if os.path.isfile(p))
+
+def get_output_name(args, input_file, batch):
+    """Returns the output path without an extension.
+    Batches write each video into the output dir, named after the input.
+    """
+    if not batch:
+        return args.output_dir
+
+    stem = os.path.splitext(os.path.basename(input_file))[0]
+    return os.path.join(args.output_dir, stem)
+
+def get_output_path(args, output_name):
+    if args.format == "raw":
+        return f"{output_name}{EXTENSION}"
+
+    return f"{output_name}.tar.gz"
+
+class TarOutput:
+    """Streams encoded PNG frames straight into a gzipped tar.
+    """
+    def __init__(self, output_name, fps, frame_count):
+        self._name = os.path.basename(output_name)
+        self._fps = fps
+        self._digits = len(str(frame_count - 1))
+        self._index = 0
+
+        self._tar = tarfile.open(f"{output_name}.tar.gz", "w:gz")
+
+    def add(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = time.time()
+        info.mode = 0o644
+
+        self._tar.addfile(info, io.BytesIO(data))
+
+    def write_frame(self, png):
+        file_name = str(self._index).zfill(self._digits)
+        self.add(f"./{self._name}/{file_name}.png", png)
+        self._index += 1
+
+    def close(self):
+        # Write fps data.
+        metadata = json.dumps({"fps": self._fps}).encode()
+        self.add(f"{self._name}/metadata.json", metadata)
+
+        self._tar.close()
+
+class RawOutput:
+    """Writes RGB frames into a raw video file.
+    """
+    def __init__(self, output_name, width, height, fps, rle, palette=None):
+        if palette is not None:
+            compression = COMPRESSION_INDEXED
+        elif rle:
+            compression = COMPRESSION_RLE
+        else:
+            compression = COMPRESSION_NONE
+
+        self._writer = RawVideoWriter(f"{output_name}{EXTENSION}", width, height, fps, compression, palette)
+
+    def write_frame(self, frame):
+        self._writer.write_frame(frame)
+
+    def close(self):
+        self._writer.close()
+
+def read_frames(cap, args, frame_count):
+    """Yields the frames to convert, after skipping the offset.
+    """
+    for i in range(args.offset):
+        ret, _ = cap.read()
+        if not ret:
+            return
+
+    current_frame = 1
+    while args.num_frames == -1 or current_frame <= frame_count:
+        ret, frame = cap.read()
+        if not ret:
+            return
+
+        yield frame
+        current_frame += 1
+
+def open_output(args, output_name, frame_count, palette=None):
+    if args.format == "raw":
+        return RawOutput(output_name, args.width, args.height, args.fps, args.rle, palette)
+
+    return TarOutput(output_name, args.fps, frame_count)
+
+def convert(args, input_file, output_name, pool, show_progress):
+    """Decodes a video in this process and resizes and encodes its frames in the pool.
+    Frames are written in order as they come back, with a bounded number in flight.
+    """
+    cap = cv2.VideoCapture(input_file)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    if args.num_frames != -1:
+        frame_count = min(frame_count, args.num_frames)
+
+    frame_count = max(frame_count, 1)
+
+    max_in_flight = args.jobs * 4
+    frames = read_frames(cap, args, frame_count)
+
+    if args.palette:
+        # The palette is chosen from the whole clip, so resize everything first.
+        # Resized frames are small enough to keep in memory.
+        resized = list(map_ordered(pool, resize_frame, ((frame, args.width, args.height) for frame in frames), max_in_flight))
+
+        palette = build_palette(resized, args.palette, args.palette_method, args.pwm_bits)
+        palette_lab = to_lab(palette.reshape(-1, 1, 3)).reshape(-1, 3)
+        spread = dither_spread(palette, args.pwm_bits) if args.dither != "none" else 0
+
+        def get_shift(i):
+            return TEMPORAL_SHIFTS[i % len(TEMPORAL_SHIFTS)] if args.dither == "temporal" else (0, 0)
+
+        output = open_output(args, output_name, frame_count, palette)
+        results = map_ordered(
+            pool,
+            quantize_frame,
+            ((rgb, palette, palette_lab, spread, get_shift(i), args.format) for i, rgb in enumerate(resized)),
+            max_in_flight,
+        )
+    else:
+        output = open_output(args, output_name, frame_count)
+        results = map_ordered(
+            pool,
+            process_frame,
+            ((frame, args.width, args.height, args.format) for frame in frames),
+            max_in_flight,
+        )
+
+    written = 0
+    for data in results:
+        output.write_frame(data)
+        written += 1
+
+        if show_progress:
+            log(f"Converting {written}/{frame_count}", end="\r")
+
+    cap.release()
+    output.close()
+
+    if args.palette and written > 0:
+        report_quantization(args, output_name, resized, len(palette))
+
+    return written
+
+def decode_output(args, path):
+    """Decodes every frame of a converted video the way VideoView does.
+    Returns the number of frames and the time taken.
+    """
+    start = time.perf_counter()
+    frames = 0
+
+    if args.format == "raw":
+        video = RawVideo(path)
+        for i in range(len(video)):
+            video.get_frame(i)
+            frames += 1
+
+        video.close()
+    else:
+        with tarfile.open(path, "r|gz") as tar:
+            for member in tar:
+                if "metadata.json" in member.name or not member.isfile():
+                    continue
+
+                frame = Image.open(io.BytesIO(tar.extractfile(member).read()))
+                frame.convert("RGB")
+                frames += 1
+
+    return frames, time.perf_counter() - start
+
+def report_quantization(args, output_name, resized, colors):
+    """Compares the size and decode time of the indexed output against the
+    same frames stored at full 24-bit colour.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        full_name = os.path.join(tmp_dir, os.path.basename(output_name))
+        if args.format == "raw":
+            output = RawOutput(full_name, args.width, args.height, args.fps, False)
+        else:
+            output = TarOutput(full_name, args.fps, len(resized))
+
+        for rgb in resized:
+            if args.format == "raw":
+                output.write_frame(rgb)
+            else:
+                ret, png = cv2.imencode(".png", cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+                output.write_frame(png.tobytes())
+
+        output.close()
+
+        full_path = get_output_path(args, full_name)
+        full_size = os.path.getsize(full_path)
+        frames, full_time = decode_output(args, full_path)
+
+    output_path = get_output_path(args, output_name)
+    size = os.path.getsize(output_path)
+    _, decode_time = decode_output(args, output_path)
+
+    def row(label, size, seconds):
+        return f"  {label:<12} {size / 1024:>9.1f} KB {seconds * 1000 / frames:>8.3f} ms/frame"
+
+    log(
+        f"Quantization report for {output_path} ({frames} frames):\n"
+        + row("24-bit", full_size, full_time) + "\n"
+        + row(f"{colors} colours", size, decode_time)
+        + f" ({round(100 * size / full_size)}% of the size, {round(full_time / max(decode_time, 1e-9), 2)}x decode speed)"
+    )
+
 def main():
     """Entry point.
     """
     # Parse arguments.
     parser = argparse.ArgumentParser()
     parser.add_argument("input_file", type=str,
-                        help="path to video file to convert")
-    parser.add_argument("output_dir", type=str, help="path to output dir")
+                        help="path to a video file, a directory of videos or a glob to convert")
+    parser.add_argument("output_dir", type=str,
+                        help="path to output dir. for several inputs, the directory to write each video to")
     parser.add_argument("-x", "--width", type=int,
                         help="width (in pixels) of output. default 64", default=64)
     parser.add_argument("-y", "--height", type=int,
@@ -27,86 +407,86 @@ def main():
                         help="fps of new video. default 24", default=24)
     parser.add_argument("-o", "--offset", type=int,
                         help="video offset. default 0", default=0)
+    parser.add_argument("--format", type=str, choices=["tar", "raw"],
+                        help="output format. tar of PNGs or raw RGB frames. default tar", default="tar")
+    parser.add_argument("--rle", action="store_true",
+                        help="run-length encode raw frames")
+    parser.add_argument("-p", "--palette", type=int,
+                        help="quantize to a palette of this many colours (2-256), stored as indexed frames. default off",
+                        default=0)
+    parser.add_argument("--palette-method", type=str, choices=["kmeans", "median-cut"],
+                        help="how the palette is chosen. default kmeans", default="kmeans")
+    parser.add_argument("--dither", type=str, choices=["none", "ordered", "temporal"],
+                        help="dithering used with --palette. temporal shifts the pattern every frame. default temporal",
+                        default="temporal")
+    parser.add_argument("--pwm-bits", type=int,
+                        help="the panel's --led-pwm-bits, used to tune the palette and dithering. default 11",
+                        default=11)
+    parser.add_argument("-j", "--jobs", type=int,
+                        help="worker processes for resizing and encoding. default cpu count",
+                        default=os.cpu_count() or 1)
+    parser.add_argument("-c", "--concurrent", type=int,
+                        help="videos to convert at the same time in a batch. default 2", default=2)
+    parser.add_argument("--overwrite", action="store_true",
+                        help="overwrite existing output without asking")
 
     args = parser.parse_args()
 
-    # Check if file exists.
-    if not os.path.isfile(args.input_file) or not os.path.exists(args.input_file):
+    if args.palette and not 2 <= args.palette <= 256:
+        parser.error("--palette must be between 2 and 256")
+
+    if args.palette and args.rle:
+        parser.error("--rle can't be combined with --palette")
+
+    # Check if files exist.
+    inputs = find_inputs(args.input_file)
+    if not inputs:
         print("File " + args.input_file + " not found")
         exit(1)
 
-    # Open files.
-    cap = cv2.VideoCapture(args.input_file)
-    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    batch = len(inputs) > 1 or not os.path.isfile(args.input_file)
 
-    if args.num_frames != -1:
-        frame_count = min(frame_count, args.num_frames)
-    
     # Print configuration.
-    print(f"Input:  {args.input_file}")
+    print(f"Input:  {args.input_file} ({len(inputs)} video{'s' if len(inputs) != 1 else ''})")
     print(f"Output: {args.output_dir}")
     print(f"Width:  {args.width}")
     print(f"Height: {args.height}")
-    print(f"Frames: {frame_count}")
     print(f"FPS:    {args.fps}")
     print(f"Offset: {args.offset}")
+    print(f"Format: {args.format}")
+    if args.palette:
+        print(f"Palette: {args.palette} colours ({args.palette_method}, {args.dither} dither, {args.pwm_bits} pwm bits)")
+    print(f"Jobs:   {args.jobs}")
     print()
 
-    # Make output dir.
-    if os.path.exists(args.output_dir) or os.path.exists(f"{args.output_dir}.tar.gz"):
-        r = input(f"Files for {args.output_dir} already exist. Overwrite? [y/N]: ")
+    jobs = [(input_file, get_output_name(args, input_file, batch)) for input_file in inputs]
+
+    # Check for existing output before starting.
+    existing = [get_output_path(args, name) for _, name in jobs if os.path.exists(get_output_path(args, name))]
+    if existing and not args.overwrite:
+        r = input(f"Files for {', '.join(existing)} already exist. Overwrite? [y/N]: ")
         if r.lower() != "y":
             exit(0)
 
-    tar = tarfile.open(f"{args.output_dir}.tar.gz", "w:gz") 
-
-    # Delete existing output path.
-    if os.path.isfile(args.output_dir):
-        os.remove(args.output_dir)
-    elif os.path.isdir(args.output_dir):
-        shutil.rmtree(args.output_dir)
-
-    os.mkdir(args.output_dir)
-
-    for i in range(args.offset):
-        ret, _ = cap.read()
-        if not ret:
-            break
+    if batch:
+        os.makedirs(args.output_dir, exist_ok=True)
 
     print("Starting conversion...")
-    current_frame = 1
-    while args.num_frames == -1 or current_frame <= frame_count:
-        print(f"Converting {current_frame}/{frame_count}", end="\r")
-        ret, frame = cap.read()
-        if ret == True:
-            resized = pixelate(frame, args.width, args.height)
-
-            file_name = str(current_frame-1).zfill(len(str(frame_count-1)))
-            file_path = f"./{args.output_dir}/{file_name}.png"
-
-            cv2.imwrite(file_path, resized)
-            tar.add(file_path)
-        else:
-            break
-
-        current_frame += 1
-
-    cap.release()
-    cv2.destroyAllWindows()
+    start_time = time.time()
 
-    # Write fps data.
-    metadata = {
-        "fps": args.fps
-    }
-    
-    meta_path = os.path.join(args.output_dir, "metadata.json")
-    with open(meta_path, "w") as of:
-        json.dump(metadata, of)
-        of.close()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=args.concurrent) as videos:
+            futures = {
+                videos.submit(convert, args, input_file, output_name, pool, not batch): input_file
+                for input_file, output_name in jobs
+            }
 
-    tar.add(meta_path)
+            for future in concurrent.futures.as_completed(futures):
+                frames = future.result()
+                if batch:
+                    log(f"Converted {futures[future]} ({frames} frames)")
 
-    print("\nDone.")
+    print(f"\nDone in {round(time.time() - start_time, 1)} s.")
 
 if __name__ == "__main__":
     main()